@@ -3,18 +3,33 @@ SmartReads Web Application
 FastAPI-based proof-of-concept for the book recommendation system
 """
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.datastructures import Headers
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Iterable, Iterator, Tuple
 from contextlib import asynccontextmanager
-import json
+from collections import OrderedDict, defaultdict
+import asyncio
+import gzip
+import hashlib
+import mmap
 import os
+import sys
+import ijson
+import msgpack
+import orjson
 from datetime import datetime
 import uvicorn
 
+try:
+    import brotli  # optional: smaller pre-compressed web interface
+except ImportError:
+    brotli = None
+
 from recommendation_engine import (
     SmartReadsRecommendationEngine,
     Book, Student, BorrowingRecord, Recommendation
@@ -23,8 +38,10 @@ from data_generator import generate_sample_data
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    initialize_engine()
+    # Startup (skipped when a preloading server already built the engine,
+    # see gunicorn_conf.py)
+    if recommendation_engine is None:
+        initialize_engine()
     yield
     # Shutdown (if needed)
 
@@ -33,7 +50,9 @@ app = FastAPI(
     title="SmartReads Book Recommendation System",
     description="AI-powered book recommendations for school districts",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson encodes the large book/recommendation lists far faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -45,9 +64,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Content-codings listed in an Accept-Encoding header, minus those with q=0"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+class QValueGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that also honours `gzip;q=0` (it only looks for the substring)"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" not in _accepted_encodings(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Book and recommendation lists are repetitive JSON and compress well; level 1
+# keeps the CPU cost negligible
+app.add_middleware(QValueGZipMiddleware, minimum_size=500, compresslevel=1)
+
+# The web interface is a static page shipped next to this module
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+INDEX_HTML = os.path.join(STATIC_DIR, "index.html")
+INDEX_HTML_HEADERS = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+
 # Global recommendation engine instance
 recommendation_engine = None
 
+# Serialized JSON bodies for the read-only endpoints. Keys carry the data
+# version so anything built against a previous engine is never served.
+_data_version = 0
+_response_cache: Dict[Tuple, bytes] = {}
+_RESPONSE_CACHE_SIZE = 32
+
+# Serialized recommendations per (student_id, n, data version), in LRU order
+_recommendation_cache: "OrderedDict[Tuple[str, int, int], bytes]" = OrderedDict()
+_RECOMMENDATION_CACHE_SIZE = 4096
+
+# Response payloads materialized once per engine load
+_books_payload: List[Dict[str, Any]] = []
+_student_payloads: Dict[str, Dict[str, Any]] = {}
+
 # Pydantic models for API
 class BookResponse(BaseModel):
     book_id: str
@@ -88,75 +157,256 @@ class AnalyticsResponse(BaseModel):
     catalog_coverage: float
     genre_distribution: Dict[str, int]
 
+def _book_to_dict(book: Book) -> Dict[str, Any]:
+    """Build the BookResponse payload for a book without Pydantic validation"""
+    return {
+        'book_id': book.book_id,
+        'title': book.title,
+        'author': book.author,
+        'isbn': book.isbn,
+        'genre': book.genre,
+        'subject': book.subject,
+        'reading_level': book.reading_level,
+        'description': book.description,
+        'publication_year': book.publication_year,
+        'page_count': book.page_count,
+        'popularity_score': book.popularity_score,
+        'average_rating': book.average_rating,
+        'rating_count': book.rating_count
+    }
+
+def _student_to_dict(student: Student) -> Dict[str, Any]:
+    """Build the StudentResponse payload for a student without Pydantic validation"""
+    return {
+        'student_id': student.student_id,
+        'grade_level': student.grade_level,
+        'reading_level': student.reading_level,
+        'preferred_genres': student.preferred_genres,
+        'interests': student.interests,
+        'reading_history': student.reading_history,
+        'books_read_count': len(student.reading_history)
+    }
+
+# Data files are private to this service, so they are stored as MessagePack,
+# which parses considerably faster than JSON. JSON files (from older releases
+# or `python data_generator.py`) are still read when they are the newer set.
+DATA_DIR = "data"
+DATA_FILES = [os.path.join(DATA_DIR, f"{name}.msgpack") for name in ("books", "students", "borrowing_history")]
+JSON_DATA_FILES = [os.path.join(DATA_DIR, f"{name}.json") for name in ("books", "students", "borrowing_history")]
+
+def _load_json_file(path: str) -> Any:
+    """Parse a JSON file directly from a read-only memory map"""
+    # The OS pages the file in on demand and can share those pages between
+    # forked workers, instead of each copying it into a bytes object
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            return orjson.loads(view)
+
+def _load_msgpack_file(path: str) -> Any:
+    """Unpack a MessagePack file directly from a read-only memory map"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            return msgpack.unpackb(view, raw=False)
+
+def _iter_msgpack_items(f) -> Iterator[Any]:
+    """Stream the items of a top-level MessagePack array"""
+    unpacker = msgpack.Unpacker(f, raw=False)
+    for _ in range(unpacker.read_array_header()):
+        yield unpacker.unpack()
+
+# Decoded files hold a fresh str for every repeated ID and category value;
+# interning collapses each to a single shared object (and makes equality
+# checks between them pointer compares)
+def _book_from_dict(data: Dict[str, Any]) -> Book:
+    """Create a book from its serialized form with interned strings"""
+    data['book_id'] = sys.intern(data['book_id'])
+    data['author'] = sys.intern(data['author'])
+    data['genre'] = [sys.intern(g) for g in data['genre']]
+    data['subject'] = [sys.intern(s) for s in data['subject']]
+    data['reading_level'] = sys.intern(data['reading_level'])
+    return Book(**data)
+
+def _student_from_dict(data: Dict[str, Any]) -> Student:
+    """Create a student from its serialized form with interned strings"""
+    data['student_id'] = sys.intern(data['student_id'])
+    data['reading_level'] = sys.intern(data['reading_level'])
+    data['preferred_genres'] = [sys.intern(g) for g in data['preferred_genres']]
+    data['interests'] = [sys.intern(i) for i in data['interests']]
+    data['reading_history'] = [sys.intern(b) for b in data['reading_history']]
+    return Student(**data)
+
+def _build_records(records_data: Iterable[Dict[str, Any]]) -> List[BorrowingRecord]:
+    """Create borrowing records from their serialized form"""
+    # Borrow/return dates repeat heavily across records, so parse each
+    # distinct string once and share the resulting datetime
+    date_cache: Dict[str, datetime] = {}
+    def parse_date(value: str) -> datetime:
+        parsed = date_cache.get(value)
+        if parsed is None:
+            parsed = date_cache[value] = datetime.fromisoformat(value)
+        return parsed
+    
+    return [BorrowingRecord(
+        student_id=sys.intern(r['student_id']),
+        book_id=sys.intern(r['book_id']),
+        borrow_date=parse_date(r['borrow_date']),
+        return_date=parse_date(r['return_date']) if r['return_date'] else None,
+        rating=r['rating'],
+        completed=r['completed']
+    ) for r in records_data]
+
+def _save_data(books: List[Book], students: List[Student], records: List[BorrowingRecord]):
+    """Persist a dataset to the MessagePack data files"""
+    books_file, students_file, history_file = DATA_FILES
+    with open(books_file, 'wb') as f:
+        f.write(msgpack.packb([b.to_dict() for b in books]))
+    with open(students_file, 'wb') as f:
+        f.write(msgpack.packb([s.to_dict() for s in students]))
+    with open(history_file, 'wb') as f:
+        records_data = [{
+            'student_id': r.student_id,
+            'book_id': r.book_id,
+            'borrow_date': r.borrow_date.isoformat(),
+            'return_date': r.return_date.isoformat() if r.return_date else None,
+            'rating': r.rating,
+            'completed': r.completed
+        } for r in records]
+        f.write(msgpack.packb(records_data))
+
+def _load_data() -> Tuple[List[Book], List[Student], List[BorrowingRecord]]:
+    """Load the MessagePack data files"""
+    books_file, students_file, history_file = DATA_FILES
+    books = [_book_from_dict(b) for b in _load_msgpack_file(books_file)]
+    students = [_student_from_dict(s) for s in _load_msgpack_file(students_file)]
+    # Stream the history (the largest file) instead of unpacking it whole
+    with open(history_file, 'rb') as f:
+        records = _build_records(_iter_msgpack_items(f))
+    return books, students, records
+
+def _data_mtime(paths: List[str]) -> Optional[float]:
+    """Last modification time of a complete set of data files, None if incomplete"""
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    return max(os.path.getmtime(p) for p in paths)
+
+def _load_json_data() -> Tuple[List[Book], List[Student], List[BorrowingRecord]]:
+    """Load data files written as JSON by earlier releases"""
+    books_file, students_file, history_file = JSON_DATA_FILES
+    books = [_book_from_dict(b) for b in _load_json_file(books_file)]
+    students = [_student_from_dict(s) for s in _load_json_file(students_file)]
+    # ijson streams the history and picks its yajl2_c backend when available
+    with open(history_file, 'rb') as f:
+        records = _build_records(ijson.items(f, 'item'))
+    return books, students, records
+
+def ensure_data_files():
+    """Generate and save sample data when no complete set of data files exists"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if _data_mtime(DATA_FILES) is None and _data_mtime(JSON_DATA_FILES) is None:
+        print("Generating sample data...")
+        _save_data(*generate_sample_data())
+
 def initialize_engine():
     """Initialize the recommendation engine with sample data"""
-    global recommendation_engine
+    global recommendation_engine, _data_version, _books_payload, _student_payloads
+    global _response_cache, _recommendation_cache
     
     print("Initializing recommendation engine...")
-    recommendation_engine = SmartReadsRecommendationEngine()
+    # Build into a local engine and publish it only once fully loaded, so
+    # requests served during a background regeneration see the old data
+    engine = SmartReadsRecommendationEngine()
     
     # Check if data files exist
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(DATA_DIR, exist_ok=True)
     
-    books_file = os.path.join(data_dir, "books.json")
-    students_file = os.path.join(data_dir, "students.json")
-    history_file = os.path.join(data_dir, "borrowing_history.json")
-    
-    # Generate or load data
-    if not all(os.path.exists(f) for f in [books_file, students_file, history_file]):
+    # Generate or load data, preferring whichever complete set was written last
+    msgpack_mtime = _data_mtime(DATA_FILES)
+    json_mtime = _data_mtime(JSON_DATA_FILES)
+    if msgpack_mtime is not None and (json_mtime is None or msgpack_mtime >= json_mtime):
+        print("Loading existing data...")
+        books, students, records = _load_data()
+    elif json_mtime is not None:
+        print("Loading existing JSON data...")
+        books, students, records = _load_json_data()
+    else:
         print("Generating sample data...")
         books, students, records = generate_sample_data()
-        
         # Save to files for persistence
-        with open(books_file, 'w') as f:
-            json.dump([b.to_dict() for b in books], f)
-        with open(students_file, 'w') as f:
-            json.dump([s.to_dict() for s in students], f)
-        with open(history_file, 'w') as f:
-            records_data = [{
-                'student_id': r.student_id,
-                'book_id': r.book_id,
-                'borrow_date': r.borrow_date.isoformat(),
-                'return_date': r.return_date.isoformat() if r.return_date else None,
-                'rating': r.rating,
-                'completed': r.completed
-            } for r in records]
-            json.dump(records_data, f)
-    else:
-        print("Loading existing data...")
-        # Load from files
-        with open(books_file, 'r') as f:
-            books_data = json.load(f)
-            books = [Book(**b) for b in books_data]
-        
-        with open(students_file, 'r') as f:
-            students_data = json.load(f)
-            students = [Student(**s) for s in students_data]
-        
-        with open(history_file, 'r') as f:
-            records_data = json.load(f)
-            records = [BorrowingRecord(
-                student_id=r['student_id'],
-                book_id=r['book_id'],
-                borrow_date=datetime.fromisoformat(r['borrow_date']),
-                return_date=datetime.fromisoformat(r['return_date']) if r['return_date'] else None,
-                rating=r['rating'],
-                completed=r['completed']
-            ) for r in records_data]
+        _save_data(books, students, records)
     
     # Load data into engine
-    recommendation_engine.load_catalog(books)
-    recommendation_engine.load_students(students)
-    recommendation_engine.load_borrowing_history(records)
+    engine.load_catalog(books)
+    engine.load_students(students)
+    engine.load_borrowing_history(records)
+    
+    # Precompute the list payloads so requests only slice and serialize
+    _books_payload = [_book_to_dict(b) for b in engine.books_catalog.values()]
+    # Students are kept in ID order so the list endpoint never has to sort
+    _student_payloads = {
+        student_id: _student_to_dict(engine.students[student_id])
+        for student_id in sorted(engine.students)
+    }
+    recommendation_engine = engine
+    
+    # Invalidate serialized responses built from the previous data. The caches
+    # are replaced rather than cleared because this may run off the event loop.
+    _data_version += 1
+    _response_cache = {}
+    _recommendation_cache = OrderedDict()
     
     print(f"Engine initialized with {len(books)} books, {len(students)} students, and {len(records)} borrowing records")
 
+def _cached_json_response(key: Tuple, build: Callable[[], Any]) -> Response:
+    """Serve a JSON body from the response cache, building it on a miss"""
+    # initialize_engine may swap the cache from another thread, so look the
+    # global up once and work on that dict throughout
+    cache = _response_cache
+    cache_key = (*key, _data_version)
+    content = cache.get(cache_key)
+    if content is None:
+        content = orjson.dumps(build())
+        if len(cache) >= _RESPONSE_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[cache_key] = content
+    return Response(content=content, media_type="application/json")
+
+def _load_index_html() -> Tuple[str, bytes, Dict[str, bytes]]:
+    """Read the web interface and build its ETag and pre-compressed bodies"""
+    with open(INDEX_HTML, 'rb') as f:
+        html = f.read()
+    # Compressed once at the highest level, best encoding first
+    encoded = {}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(html, quality=11)
+    encoded["gzip"] = gzip.compress(html, compresslevel=9)
+    # Weak, since the same tag covers every content-coding of the page
+    etag = f'W/"{hashlib.blake2b(html, digest_size=8).hexdigest()}"'
+    return etag, html, encoded
+
+# Read and compressed once at import, so requests (and every preforked
+# worker) share the same ready-to-send bytes
+INDEX_HTML_ETAG, INDEX_HTML_BYTES, INDEX_HTML_ENCODED = _load_index_html()
+
+# Route handlers only touch in-memory state, so they are all declared
+# `async def` to stay on the event loop instead of hopping to the threadpool
+# (enforced by test_demo.test_routes_are_async).
+
 @app.get("/", response_class=HTMLResponse)
-async def home():
+async def home(request: Request):
     """Serve the main HTML interface"""
-    return HTML_CONTENT
+    headers = {**INDEX_HTML_HEADERS, "ETag": INDEX_HTML_ETAG}
+    if INDEX_HTML_ETAG in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for encoding, content in INDEX_HTML_ENCODED.items():
+        if encoding in accepted:
+            return Response(
+                content=content,
+                media_type="text/html",
+                headers={**headers, "Content-Encoding": encoding}
+            )
+    return Response(content=INDEX_HTML_BYTES, media_type="text/html", headers=headers)
 
 @app.get("/api/students", response_model=List[StudentResponse])
 async def get_students():
@@ -164,21 +414,11 @@ async def get_students():
     if not recommendation_engine:
         raise HTTPException(status_code=500, detail="Engine not initialized")
     
-    students = []
-    for student_id, student in recommendation_engine.students.items():
-        students.append(StudentResponse(
-            student_id=student.student_id,
-            grade_level=student.grade_level,
-            reading_level=student.reading_level,
-            preferred_genres=student.preferred_genres,
-            interests=student.interests,
-            reading_history=student.reading_history,
-            books_read_count=len(student.reading_history)
-        ))
+    def build():
+        # Already sorted by student ID
+        return list(_student_payloads.values())
     
-    # Sort by student ID
-    students.sort(key=lambda x: x.student_id)
-    return students
+    return _cached_json_response(("students",), build)
 
 @app.get("/api/students/{student_id}", response_model=StudentResponse)
 async def get_student(student_id: str):
@@ -186,82 +426,121 @@ async def get_student(student_id: str):
     if not recommendation_engine:
         raise HTTPException(status_code=500, detail="Engine not initialized")
     
-    if student_id not in recommendation_engine.students:
+    if student_id not in _student_payloads:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    student = recommendation_engine.students[student_id]
-    return StudentResponse(
-        student_id=student.student_id,
-        grade_level=student.grade_level,
-        reading_level=student.reading_level,
-        preferred_genres=student.preferred_genres,
-        interests=student.interests,
-        reading_history=student.reading_history,
-        books_read_count=len(student.reading_history)
-    )
+    return ORJSONResponse(_student_payloads[student_id])
 
 @app.get("/api/books", response_model=List[BookResponse])
-async def get_books(limit: int = 50):
+async def get_books(limit: int = Query(50, gt=0, le=500)):
     """Get all books"""
     if not recommendation_engine:
         raise HTTPException(status_code=500, detail="Engine not initialized")
     
-    books = []
-    for book_id, book in list(recommendation_engine.books_catalog.items())[:limit]:
-        books.append(BookResponse(
-            book_id=book.book_id,
-            title=book.title,
-            author=book.author,
-            isbn=book.isbn,
-            genre=book.genre,
-            subject=book.subject,
-            reading_level=book.reading_level,
-            description=book.description,
-            publication_year=book.publication_year,
-            page_count=book.page_count,
-            popularity_score=book.popularity_score,
-            average_rating=book.average_rating,
-            rating_count=book.rating_count
-        ))
+    def build():
+        return _books_payload[:limit]
+    
+    return _cached_json_response(("books", limit), build)
+
+def _serialize_recommendations(recommendations: List[Recommendation]) -> bytes:
+    """Encode recommendations as the RecommendationResponse JSON list"""
+    return orjson.dumps([{
+        'book': _book_to_dict(rec.book),
+        'score': float(rec.score),
+        'reason': rec.reason,
+        'strategy': rec.strategy,
+        'confidence': float(rec.confidence)
+    } for rec in recommendations])
+
+class RecommendationBatcher:
+    """
+    Batches concurrent recommendation requests.
+    
+    Requests pending when the next event loop iteration runs are grouped by
+    requested count and scored with one `recommend_batch` call per group, so
+    a lone request is not delayed. Identical in-flight requests share a
+    single result.
+    """
+    
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._flush_scheduled = False
+    
+    async def submit(self, student_id: str, n: int) -> bytes:
+        """Queue a request and wait for its serialized recommendations"""
+        key = (student_id, n)
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush)
+        # Shield so one disconnecting client doesn't cancel the shared result
+        return await asyncio.shield(future)
     
-    return books
+    def _flush(self):
+        """Score every pending request, one batch per requested count"""
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        version = _data_version
+        cache = _recommendation_cache  # see _cached_json_response
+        
+        student_ids_by_n = defaultdict(list)
+        for student_id, n in pending:
+            student_ids_by_n[n].append(student_id)
+        
+        try:
+            for n, student_ids in student_ids_by_n.items():
+                try:
+                    results = recommendation_engine.recommend_batch(student_ids, n)
+                except Exception as e:
+                    for student_id in student_ids:
+                        pending[(student_id, n)].set_exception(e)
+                    continue
+                
+                for student_id, recommendations in results.items():
+                    future = pending[(student_id, n)]
+                    try:
+                        content = _serialize_recommendations(recommendations)
+                        cache[(student_id, n, version)] = content
+                        if len(cache) > _RECOMMENDATION_CACHE_SIZE:
+                            cache.popitem(last=False)
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(content)
+        finally:
+            # Never leave a waiting request hanging
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Recommendation request was not completed"))
+
+_recommendation_batcher = RecommendationBatcher()
 
-@app.get("/api/recommendations/{student_id}", response_model=List[RecommendationResponse])
-async def get_recommendations(student_id: str, n: int = 10):
+# The engine output is trusted, so skip response_model validation and only
+# keep the schema for the OpenAPI docs
+@app.get(
+    "/api/recommendations/{student_id}",
+    responses={200: {"model": List[RecommendationResponse]}}
+)
+async def get_recommendations(student_id: str, n: int = Query(10, gt=0, le=100)):
     """Get book recommendations for a student"""
     if not recommendation_engine:
         raise HTTPException(status_code=500, detail="Engine not initialized")
     
-    try:
-        recommendations = recommendation_engine.recommend(student_id, n)
-        
-        responses = []
-        for rec in recommendations:
-            responses.append(RecommendationResponse(
-                book=BookResponse(
-                    book_id=rec.book.book_id,
-                    title=rec.book.title,
-                    author=rec.book.author,
-                    isbn=rec.book.isbn,
-                    genre=rec.book.genre,
-                    subject=rec.book.subject,
-                    reading_level=rec.book.reading_level,
-                    description=rec.book.description,
-                    publication_year=rec.book.publication_year,
-                    page_count=rec.book.page_count,
-                    popularity_score=rec.book.popularity_score,
-                    average_rating=rec.book.average_rating,
-                    rating_count=rec.book.rating_count
-                ),
-                score=rec.score,
-                reason=rec.reason,
-                strategy=rec.strategy,
-                confidence=rec.confidence
-            ))
-        
-        return responses
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Reject unknown IDs before they reach the engine or the caches
+    if student_id not in recommendation_engine.students:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    cache = _recommendation_cache  # see _cached_json_response
+    key = (student_id, n, _data_version)
+    content = cache.get(key)
+    if content is None:
+        content = await _recommendation_batcher.submit(student_id, n)
+    else:
+        cache.move_to_end(key)
+    return Response(content=content, media_type="application/json")
 
 @app.get("/api/analytics", response_model=AnalyticsResponse)
 async def get_analytics():
@@ -269,697 +548,58 @@ async def get_analytics():
     if not recommendation_engine:
         raise HTTPException(status_code=500, detail="Engine not initialized")
     
-    analytics = recommendation_engine.get_analytics()
+    def build():
+        analytics = recommendation_engine.get_analytics()
+        
+        return AnalyticsResponse(
+            total_students=analytics['total_students'],
+            total_books=analytics['total_books'],
+            total_borrowing_records=analytics['total_borrowing_records'],
+            average_books_per_student=analytics['average_books_per_student'],
+            catalog_coverage=analytics['catalog_coverage'],
+            genre_distribution=analytics['genre_distribution']
+        ).model_dump()
     
-    return AnalyticsResponse(
-        total_students=analytics['total_students'],
-        total_books=analytics['total_books'],
-        total_borrowing_records=analytics['total_borrowing_records'],
-        average_books_per_student=analytics['average_books_per_student'],
-        catalog_coverage=analytics['catalog_coverage'],
-        genre_distribution=analytics['genre_distribution']
-    )
+    return _cached_json_response(("analytics",), build)
 
-@app.post("/api/regenerate-data")
-async def regenerate_data():
-    """Regenerate sample data and reinitialize the engine"""
-    try:
-        # Delete existing data files
-        data_files = ["data/books.json", "data/students.json", "data/borrowing_history.json"]
-        for file in data_files:
-            if os.path.exists(file):
-                os.remove(file)
-        
-        # Reinitialize engine with new data
-        initialize_engine()
-        
-        return {"message": "Data regenerated successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-# HTML content for the web interface
-HTML_CONTENT = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>SmartReads - Book Recommendation System</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-        }
-        
-        header {
-            text-align: center;
-            color: white;
-            margin-bottom: 40px;
-        }
-        
-        h1 {
-            font-size: 3em;
-            margin-bottom: 10px;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.2);
-        }
-        
-        .subtitle {
-            font-size: 1.2em;
-            opacity: 0.9;
-        }
-        
-        .main-content {
-            background: white;
-            border-radius: 20px;
-            padding: 30px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-        }
-        
-        .section {
-            margin-bottom: 30px;
-        }
-        
-        .section-title {
-            font-size: 1.5em;
-            color: #333;
-            margin-bottom: 15px;
-            padding-bottom: 10px;
-            border-bottom: 2px solid #667eea;
-        }
-        
-        .controls {
-            display: flex;
-            gap: 15px;
-            margin-bottom: 20px;
-            flex-wrap: wrap;
-        }
-        
-        select, button {
-            padding: 10px 20px;
-            font-size: 1em;
-            border-radius: 8px;
-            border: 2px solid #667eea;
-            background: white;
-            color: #333;
-            cursor: pointer;
-            transition: all 0.3s ease;
-        }
-        
-        button {
-            background: #667eea;
-            color: white;
-            font-weight: bold;
-        }
-        
-        button:hover {
-            background: #764ba2;
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-        }
-        
-        select:focus {
-            outline: none;
-            border-color: #764ba2;
-        }
-        
-        .student-info {
-            background: #f8f9fa;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-        }
-        
-        .student-info h3 {
-            color: #667eea;
-            margin-bottom: 10px;
-        }
-        
-        .info-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-            margin-top: 10px;
-        }
-        
-        .info-item {
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .info-label {
-            font-weight: bold;
-            color: #666;
-            font-size: 0.9em;
-            margin-bottom: 5px;
-        }
-        
-        .info-value {
-            color: #333;
-        }
-        
-        .tag {
-            display: inline-block;
-            background: #667eea;
-            color: white;
-            padding: 3px 8px;
-            border-radius: 4px;
-            margin: 2px;
-            font-size: 0.9em;
-        }
-        
-        .tag-subject {
-            display: inline-block;
-            background: #e0e0e0;
-            color: #555;
-            padding: 3px 8px;
-            border-radius: 4px;
-            margin: 2px;
-            font-size: 0.85em;
-            cursor: help;
-        }
-        
-        .tag-highlight {
-            display: inline-block;
-            background: #ffd700;
-            color: #333;
-            padding: 3px 8px;
-            border-radius: 4px;
-            margin: 2px;
-            font-size: 0.85em;
-            font-weight: bold;
-            box-shadow: 0 0 8px rgba(255, 215, 0, 0.5);
-            animation: pulse 2s ease-in-out infinite;
-            cursor: help;
-        }
-        
-        @keyframes pulse {
-            0%, 100% { box-shadow: 0 0 8px rgba(255, 215, 0, 0.5); }
-            50% { box-shadow: 0 0 15px rgba(255, 215, 0, 0.8); }
-        }
-        
-        .book-subjects {
-            margin-bottom: 10px;
-            font-size: 0.9em;
-            color: #555;
-        }
-        
-        .book-subjects strong {
-            color: #333;
-            margin-right: 5px;
-        }
-        
-        .recommendations {
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 20px;
-        }
-        
-        .recommendation-card {
-            background: white;
-            border: 2px solid #e0e0e0;
-            border-radius: 10px;
-            padding: 20px;
-            transition: all 0.3s ease;
-        }
-        
-        .recommendation-card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-            border-color: #667eea;
-        }
-        
-        .book-title {
-            font-size: 1.2em;
-            font-weight: bold;
-            color: #333;
-            margin-bottom: 5px;
-        }
-        
-        .book-author {
-            color: #666;
-            margin-bottom: 10px;
-        }
-        
-        .book-details {
-            font-size: 0.9em;
-            color: #666;
-            margin-bottom: 10px;
-        }
-        
-        .book-genres {
-            margin-bottom: 10px;
-        }
-        
-        .recommendation-reason {
-            background: #f0f4ff;
-            padding: 10px;
-            border-radius: 8px;
-            margin: 10px 0;
-            font-style: italic;
-            color: #555;
-        }
-        
-        .score-bar {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            margin-top: 10px;
-        }
-        
-        .score-label {
-            font-weight: bold;
-            color: #667eea;
-            min-width: 80px;
-        }
-        
-        .score-progress {
-            flex: 1;
-            height: 10px;
-            background: #e0e0e0;
-            border-radius: 5px;
-            overflow: hidden;
-        }
-        
-        .score-fill {
-            height: 100%;
-            background: linear-gradient(90deg, #667eea, #764ba2);
-            transition: width 0.5s ease;
-        }
-        
-        .strategy-badge {
-            display: inline-block;
-            background: #28a745;
-            color: white;
-            padding: 3px 8px;
-            border-radius: 4px;
-            font-size: 0.8em;
-            font-weight: bold;
-            text-transform: uppercase;
-            margin-top: 10px;
-        }
-        
-        .analytics {
-            background: #f8f9fa;
-            padding: 20px;
-            border-radius: 10px;
-            margin-top: 20px;
-        }
-        
-        .stat-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 20px;
-            margin-top: 15px;
-        }
-        
-        .stat-card {
-            text-align: center;
-            padding: 15px;
-            background: white;
-            border-radius: 8px;
-            border: 1px solid #e0e0e0;
-        }
-        
-        .stat-value {
-            font-size: 2em;
-            font-weight: bold;
-            color: #667eea;
-        }
-        
-        .stat-label {
-            color: #666;
-            font-size: 0.9em;
-            margin-top: 5px;
-        }
-        
-        .loading {
-            text-align: center;
-            padding: 40px;
-            color: #666;
-        }
-        
-        .loading::after {
-            content: '...';
-            animation: dots 1.5s infinite;
-        }
-        
-        @keyframes dots {
-            0%, 20% { content: '.'; }
-            40% { content: '..'; }
-            60%, 100% { content: '...'; }
-        }
-        
-        .error {
-            background: #fee;
-            color: #c00;
-            padding: 15px;
-            border-radius: 8px;
-            margin: 20px 0;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <header>
-            <h1>📚 SmartReads</h1>
-            <p class="subtitle">AI-Powered Book Recommendation System for School Districts</p>
-        </header>
-        
-        <div class="main-content">
-            <div class="section">
-                <h2 class="section-title">Select a Student</h2>
-                <div class="controls">
-                    <select id="studentSelect">
-                        <option value="">Loading students...</option>
-                    </select>
-                    <button onclick="getRecommendations()">Get Recommendations</button>
-                    <button onclick="showAnalytics()">Show Analytics</button>
-                    <button onclick="regenerateData()">Generate New Data</button>
-                </div>
-            </div>
-            
-            <div id="studentInfo" class="section" style="display: none;">
-                <h2 class="section-title">Student Profile</h2>
-                <div class="student-info">
-                    <div id="studentDetails"></div>
-                </div>
-            </div>
-            
-            <div id="recommendationsSection" class="section" style="display: none;">
-                <h2 class="section-title">Personalized Recommendations</h2>
-                <div id="recommendations" class="recommendations"></div>
-            </div>
-            
-            <div id="analyticsSection" class="section" style="display: none;">
-                <h2 class="section-title">System Analytics</h2>
-                <div id="analytics" class="analytics"></div>
-            </div>
-        </div>
-    </div>
+def _regenerate_engine():
+    """Replace the data files with fresh sample data and reload the engine"""
+    # Delete existing data files
+    for file in DATA_FILES + JSON_DATA_FILES:
+        if os.path.exists(file):
+            os.remove(file)
     
-    <script>
-        let students = [];
-        let currentStudent = null;
-        
-        async function loadStudents() {
-            try {
-                const response = await fetch('/api/students');
-                students = await response.json();
-                
-                const select = document.getElementById('studentSelect');
-                select.innerHTML = '<option value="">Choose a student...</option>';
-                
-                students.forEach(student => {
-                    const option = document.createElement('option');
-                    option.value = student.student_id;
-                    option.textContent = `${student.student_id} - Grade ${student.grade_level} (${student.reading_level})`;
-                    select.appendChild(option);
-                });
-            } catch (error) {
-                console.error('Error loading students:', error);
-            }
-        }
-        
-        async function getRecommendations() {
-            const studentId = document.getElementById('studentSelect').value;
-            if (!studentId) {
-                alert('Please select a student first');
-                return;
-            }
-            
-            // Hide analytics, show loading
-            document.getElementById('analyticsSection').style.display = 'none';
-            document.getElementById('recommendationsSection').style.display = 'block';
-            document.getElementById('recommendations').innerHTML = '<div class="loading">Generating recommendations</div>';
-            
-            try {
-                // Get student details
-                const studentResponse = await fetch(`/api/students/${studentId}`);
-                currentStudent = await studentResponse.json();
-                displayStudentInfo(currentStudent);
-                
-                // Get recommendations
-                const recResponse = await fetch(`/api/recommendations/${studentId}?n=10`);
-                const recommendations = await recResponse.json();
-                displayRecommendations(recommendations);
-            } catch (error) {
-                console.error('Error getting recommendations:', error);
-                document.getElementById('recommendations').innerHTML = 
-                    '<div class="error">Error loading recommendations. Please try again.</div>';
-            }
-        }
-        
-        function displayStudentInfo(student) {
-            document.getElementById('studentInfo').style.display = 'block';
-            
-            const html = `
-                <h3>Student ID: ${student.student_id}</h3>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <span class="info-label">Grade Level</span>
-                        <span class="info-value">${student.grade_level}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Reading Level</span>
-                        <span class="info-value">${student.reading_level}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Books Read</span>
-                        <span class="info-value">${student.books_read_count}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Preferred Genres</span>
-                        <span class="info-value">
-                            ${student.preferred_genres.map(g => `<span class="tag">${g}</span>`).join('')}
-                        </span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Interests</span>
-                        <span class="info-value">
-                            ${student.interests.map(i => `<span class="tag">${i}</span>`).join('')}
-                        </span>
-                    </div>
-                </div>
-            `;
-            
-            document.getElementById('studentDetails').innerHTML = html;
-        }
-        
-        function displayRecommendations(recommendations) {
-            const container = document.getElementById('recommendations');
-            
-            if (recommendations.length === 0) {
-                container.innerHTML = '<p>No recommendations available.</p>';
-                return;
-            }
-            
-            const html = recommendations.map((rec, index) => {
-                // Get student interests for highlighting matches
-                const studentInterests = currentStudent ? currentStudent.interests.map(i => i.toLowerCase()) : [];
-                
-                // Highlight matching subjects/themes
-                const subjectTags = rec.book.subject.map(subject => {
-                    const isMatch = studentInterests.some(interest => 
-                        subject.toLowerCase().includes(interest) || 
-                        interest.includes(subject.toLowerCase())
-                    );
-                    const highlightClass = isMatch ? 'tag-highlight' : 'tag-subject';
-                    return `<span class="${highlightClass}" title="${isMatch ? '✓ Matches your interests' : 'Theme'}">${subject}</span>`;
-                }).join('');
-                
-                // Generate star rating display
-                const rating = rec.book.average_rating;
-                const ratingCount = rec.book.rating_count;
-                let ratingDisplay = '';
-                
-                if (rating > 0 && ratingCount > 0) {
-                    const fullStars = Math.floor(rating);
-                    const hasHalfStar = rating % 1 >= 0.5;
-                    const emptyStars = 5 - fullStars - (hasHalfStar ? 1 : 0);
-                    
-                    ratingDisplay = `
-                        <div class="book-rating" style="margin: 8px 0; color: #ffa500;">
-                            ${'⭐'.repeat(fullStars)}${hasHalfStar ? '⭐' : ''}${'☆'.repeat(emptyStars)}
-                            <span style="color: #555; font-size: 0.9em; margin-left: 4px;">
-                                ${rating.toFixed(1)} (${ratingCount} ${ratingCount === 1 ? 'rating' : 'ratings'})
-                            </span>
-                        </div>
-                    `;
-                }
-                
-                // Generate popularity display
-                const popularity = rec.book.popularity_score;
-                let popularityDisplay = '';
-                
-                if (popularity > 0) {
-                    const popularityPercent = (popularity * 100).toFixed(0);
-                    let popularityLabel = 'Popular';
-                    let popularityColor = '#28a745';
-                    
-                    if (popularity >= 0.7) {
-                        popularityLabel = '🔥 Very Popular';
-                        popularityColor = '#ff4500';
-                    } else if (popularity >= 0.4) {
-                        popularityLabel = '📈 Popular';
-                        popularityColor = '#ffa500';
-                    } else {
-                        popularityLabel = '📚 Borrowed';
-                        popularityColor = '#667eea';
-                    }
-                    
-                    popularityDisplay = `
-                        <div class="book-popularity" style="margin: 8px 0; display: flex; align-items: center; gap: 8px;">
-                            <span style="font-size: 0.9em; color: ${popularityColor}; font-weight: bold;">
-                                ${popularityLabel}
-                            </span>
-                            <div style="flex: 1; height: 6px; background: #e0e0e0; border-radius: 3px; overflow: hidden; max-width: 100px;">
-                                <div style="height: 100%; background: ${popularityColor}; width: ${popularityPercent}%;"></div>
-                            </div>
-                        </div>
-                    `;
-                }
-                
-                return `
-                    <div class="recommendation-card">
-                        <div class="book-title">${index + 1}. ${rec.book.title}</div>
-                        <div class="book-author">by ${rec.book.author}</div>
-                        <div class="book-details">
-                            📖 ${rec.book.page_count} pages | 📚 ${rec.book.reading_level}
-                        </div>
-                        ${ratingDisplay}
-                        ${popularityDisplay}
-                        <div class="book-genres">
-                            ${rec.book.genre.map(g => `<span class="tag">${g}</span>`).join('')}
-                        </div>
-                        <div class="book-subjects">
-                            <strong>Key Themes:</strong> ${subjectTags}
-                        </div>
-                        <div class="recommendation-reason">
-                            💡 ${rec.reason}
-                        </div>
-                        <div class="score-bar">
-                            <span class="score-label">Match: ${(rec.score * 100).toFixed(0)}%</span>
-                            <div class="score-progress">
-                                <div class="score-fill" style="width: ${rec.score * 100}%"></div>
-                            </div>
-                        </div>
-                        <div>
-                            <span class="strategy-badge">${rec.strategy}</span>
-                            <span style="float: right; color: #888; font-size: 0.9em;">
-                                Confidence: ${(rec.confidence * 100).toFixed(0)}%
-                            </span>
-                        </div>
-                    </div>
-                `;
-            }).join('');
-            
-            container.innerHTML = html;
-        }
-        
-        async function showAnalytics() {
-            document.getElementById('studentInfo').style.display = 'none';
-            document.getElementById('recommendationsSection').style.display = 'none';
-            document.getElementById('analyticsSection').style.display = 'block';
-            
-            const analyticsDiv = document.getElementById('analytics');
-            analyticsDiv.innerHTML = '<div class="loading">Loading analytics</div>';
-            
-            try {
-                const response = await fetch('/api/analytics');
-                const analytics = await response.json();
-                
-                const genreChart = Object.entries(analytics.genre_distribution)
-                    .sort((a, b) => b[1] - a[1])
-                    .slice(0, 5)
-                    .map(([genre, count]) => `
-                        <div style="margin: 5px 0;">
-                            <span style="display: inline-block; width: 120px;">${genre}:</span>
-                            <span style="font-weight: bold;">${count}</span>
-                        </div>
-                    `).join('');
-                
-                const html = `
-                    <div class="stat-grid">
-                        <div class="stat-card">
-                            <div class="stat-value">${analytics.total_students}</div>
-                            <div class="stat-label">Total Students</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${analytics.total_books}</div>
-                            <div class="stat-label">Books in Catalog</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${analytics.total_borrowing_records}</div>
-                            <div class="stat-label">Total Borrows</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${analytics.average_books_per_student.toFixed(1)}</div>
-                            <div class="stat-label">Avg Books/Student</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${(analytics.catalog_coverage * 100).toFixed(0)}%</div>
-                            <div class="stat-label">Catalog Coverage</div>
-                        </div>
-                    </div>
-                    <div style="margin-top: 30px;">
-                        <h3 style="margin-bottom: 15px; color: #667eea;">Top Genres</h3>
-                        ${genreChart}
-                    </div>
-                `;
-                
-                analyticsDiv.innerHTML = html;
-            } catch (error) {
-                console.error('Error loading analytics:', error);
-                analyticsDiv.innerHTML = '<div class="error">Error loading analytics.</div>';
-            }
-        }
-        
-        async function regenerateData() {
-            if (!confirm('This will regenerate all sample data. Continue?')) {
-                return;
-            }
-            
-            const button = event.target;
-            button.disabled = true;
-            button.textContent = 'Regenerating...';
-            
-            try {
-                await fetch('/api/regenerate-data', { method: 'POST' });
-                alert('Data regenerated successfully!');
-                await loadStudents();
-                
-                // Clear any displayed content
-                document.getElementById('studentInfo').style.display = 'none';
-                document.getElementById('recommendationsSection').style.display = 'none';
-                document.getElementById('analyticsSection').style.display = 'none';
-            } catch (error) {
-                console.error('Error regenerating data:', error);
-                alert('Error regenerating data');
-            } finally {
-                button.disabled = false;
-                button.textContent = 'Generate New Data';
-            }
-        }
-        
-        // Load students on page load
-        window.addEventListener('load', loadStudents);
-    </script>
-</body>
-</html>
-"""
+    # Reinitialize engine with new data
+    initialize_engine()
+
+# The in-flight (or last finished) regeneration; a module-level reference
+# also keeps the task from being garbage collected while it runs
+_regenerate_task: Optional[asyncio.Task] = None
+
+def _regenerate_status() -> Dict[str, str]:
+    """Describe the state of the current or last regeneration"""
+    if _regenerate_task is None:
+        return {"status": "idle"}
+    if not _regenerate_task.done():
+        return {"status": "running"}
+    if _regenerate_task.exception() is not None:
+        return {"status": "failed", "detail": str(_regenerate_task.exception())}
+    return {"status": "done"}
+
+@app.post("/api/regenerate-data", status_code=202)
+async def regenerate_data():
+    """Start regenerating sample data in the background; poll /api/regenerate-status"""
+    global _regenerate_task
+    # Triggers while a regeneration is running share it instead of queueing another
+    if _regenerate_task is None or _regenerate_task.done():
+        # Generation and indexing are blocking, keep them off the event loop
+        _regenerate_task = asyncio.create_task(asyncio.to_thread(_regenerate_engine))
+    return _regenerate_status()
+
+@app.get("/api/regenerate-status")
+async def regenerate_status():
+    """Report whether a data regeneration is running, done or failed"""
+    return _regenerate_status()
 
 if __name__ == "__main__":
     # Run the FastAPI application
@@ -970,4 +610,21 @@ if __name__ == "__main__":
     print("📌 API documentation at: http://localhost:8000/docs")
     print("\nPress Ctrl+C to stop the server\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Each worker holds its own engine, so /api/regenerate-data only reloads
+    # the worker that serves it; scale out with WEB_CONCURRENCY when that's ok
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Create the data files once so workers don't race to generate them;
+        # only the workers build engines
+        ensure_data_files()
+    
+    uvicorn.run(
+        "app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        # "auto" picks uvloop/httptools when installed (uvicorn[standard])
+        # and falls back to asyncio/h11 elsewhere, e.g. on Windows
+        loop=os.getenv("UVICORN_LOOP", "auto"),
+        http=os.getenv("UVICORN_HTTP", "auto")
+    )
@@ -3,27 +3,34 @@ Data Generator for SmartReads Demo
 Generates realistic sample data for the recommendation system
 """
 
+import os
 import random
-import json
+import itertools
+import string
+import sys
+import numpy as np
+import orjson
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from collections import defaultdict
+from functools import lru_cache
 import hashlib
 from recommendation_engine import Book, Student, BorrowingRecord
 
 # Sample data pools
-FIRST_NAMES = [
+FIRST_NAMES = (
     "Emma", "Liam", "Olivia", "Noah", "Ava", "Elijah", "Sophia", "Lucas",
     "Isabella", "Oliver", "Mia", "Ethan", "Charlotte", "James", "Amelia",
     "Benjamin", "Harper", "Mason", "Evelyn", "Logan", "Abigail", "Alexander",
     "Emily", "Sebastian", "Madison", "Jack", "Chloe", "Daniel", "Grace", "Henry"
-]
+)
 
-LAST_NAMES = [
+LAST_NAMES = (
     "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
     "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson"
-]
+)
 
-BOOK_TITLES_TEMPLATES = [
+BOOK_TITLES_TEMPLATES = (
     "The {adjective} {noun}",
     "{noun} of {place}",
     "Journey to {place}",
@@ -34,161 +41,209 @@ BOOK_TITLES_TEMPLATES = [
     "Tales of {place}",
     "The {adjective} Quest",
     "{noun} and the {adjective} {noun}"
-]
+)
 
-ADJECTIVES = [
+ADJECTIVES = (
     "Mysterious", "Ancient", "Golden", "Silver", "Lost", "Hidden", "Magical",
     "Enchanted", "Forgotten", "Secret", "Crystal", "Emerald", "Sapphire",
     "Brave", "Clever", "Curious", "Amazing", "Wonderful", "Fantastic"
-]
+)
 
-NOUNS = [
+NOUNS = (
     "Dragon", "Knight", "Princess", "Wizard", "Forest", "Castle", "Mountain",
     "Ocean", "Island", "Kingdom", "Adventure", "Journey", "Quest", "Mystery",
     "Treasure", "Phoenix", "Guardian", "Explorer", "Inventor", "Detective"
-]
+)
 
-PLACES = [
+PLACES = (
     "Avalon", "Atlantis", "Eldoria", "Mystwood", "Silverstone", "Goldshire",
     "Dragonfall", "Starhaven", "Moonhallow", "Sunridge", "Windmere", "Shadowvale"
-]
+)
 
-GENRES = [
+GENRES = (
     "Fantasy", "Science Fiction", "Mystery", "Adventure", "Historical Fiction",
     "Contemporary", "Horror", "Romance", "Thriller", "Biography", "Poetry",
     "Graphic Novel", "Humor", "Sports", "Nature", "Technology"
-]
+)
 
-SUBJECTS = [
+SUBJECTS = (
     "Friendship", "Courage", "Family", "Growing Up", "Problem Solving",
     "Teamwork", "Perseverance", "Creativity", "Leadership", "Empathy",
     "Environment", "History", "Science", "Mathematics", "Arts", "Music",
     "Animals", "Space", "Time Travel", "Magic", "Robots", "Dinosaurs"
-]
+)
 
-INTERESTS = [
+INTERESTS = (
     "Sports", "Music", "Art", "Science", "Technology", "Nature", "Animals",
     "Space", "History", "Cooking", "Gaming", "Photography", "Dancing",
     "Writing", "Reading", "Traveling", "Movies", "Comics", "Puzzles", "Chess"
-]
+)
 
-def generate_isbn() -> str:
-    """Generate a realistic ISBN-13"""
-    prefix = "978"
-    group = str(random.randint(0, 9))
-    publisher = str(random.randint(10000, 99999))
-    title = str(random.randint(100, 999))
-    check = str(random.randint(0, 9))
-    return f"{prefix}-{group}-{publisher}-{title}-{check}"
+# Intern the pool words, which end up shared by every generated Book and
+# Student; identifier-like literals already are, but multi-word ones such
+# as "Science Fiction" are not
+FIRST_NAMES, LAST_NAMES, ADJECTIVES, NOUNS, PLACES, GENRES, SUBJECTS, INTERESTS = (
+    tuple(map(sys.intern, pool))
+    for pool in (FIRST_NAMES, LAST_NAMES, ADJECTIVES, NOUNS, PLACES, GENRES, SUBJECTS, INTERESTS)
+)
+
+def generate_isbns(rng: np.random.Generator, n: int) -> List[str]:
+    """Generate n realistic ISBN-13s"""
+    # Group, publisher, title and check parts for every ISBN in one draw
+    parts = rng.integers([0, 10000, 100, 0], [10, 100000, 1000, 10], size=(n, 4)).tolist()
+    return ["978-%d-%d-%d-%d" % tuple(p) for p in parts]
 
 def generate_book_id(title: str, author: str) -> str:
     """Generate unique book ID"""
     hash_input = f"{title}{author}".encode()
-    return hashlib.md5(hash_input).hexdigest()[:8].upper()
+    # A 4-byte BLAKE2 digest gives the 8 hex chars directly, no truncation
+    return hashlib.blake2b(hash_input, digest_size=4).hexdigest().upper()
 
-def generate_student_id(name: str, grade: int) -> str:
+def generate_student_id(name: str, grade: int, salt: int) -> str:
     """Generate unique student ID"""
-    hash_input = f"{name}{grade}{random.randint(1000, 9999)}".encode()
-    return f"S{hashlib.md5(hash_input).hexdigest()[:6].upper()}"
+    hash_input = f"{name}{grade}{salt}".encode()
+    return f"S{hashlib.blake2b(hash_input, digest_size=3).hexdigest().upper()}"
+
+READING_LEVELS = tuple(map(sys.intern, ("K-2", "3-5", "6-8", "9-12")))
+
+# Page count ranges (inclusive) aligned with READING_LEVELS
+PAGE_RANGES = np.array([
+    (20, 80),
+    (80, 200),
+    (150, 350),
+    (200, 500)
+])
+
+# Reading level for each grade, indexed by grade_level (K=0 through 12)
+READING_LEVEL_BY_GRADE = (
+    "K-2", "K-2", "K-2",
+    "3-5", "3-5", "3-5",
+    "6-8", "6-8", "6-8",
+    "9-12", "9-12", "9-12", "9-12"
+)
+
+STORYTELLING_STYLES = ('exciting', 'thoughtful', 'imaginative', 'compelling')
+
+# Ratings given to completed books and how likely each one is
+RATING_VALUES = np.array([3, 4, 5], dtype=np.int8)
+RATING_PROBABILITIES = (0.2, 0.4, 0.4)
+
+def _sample_rows(rng: np.random.Generator, n: int, population: int, k: int) -> np.ndarray:
+    """Draw k distinct indices from range(population) for each of n rows"""
+    return np.argsort(rng.random((n, population)), axis=1)[:, :k]
+
+# Word pool for each placeholder in BOOK_TITLES_TEMPLATES
+TITLE_WORDS = {"adjective": ADJECTIVES, "noun": NOUNS, "place": PLACES}
+
+@lru_cache(maxsize=1)
+def _all_titles() -> Tuple[str, ...]:
+    """Every distinct title the templates can produce"""
+    titles = []
+    for template in BOOK_TITLES_TEMPLATES:
+        # Only expand the placeholders this template uses (a repeated one
+        # takes the same word each time, as with str.format)
+        fields = list(dict.fromkeys(
+            name for _, name, _, _ in string.Formatter().parse(template) if name
+        ))
+        for words in itertools.product(*(TITLE_WORDS[f] for f in fields)):
+            titles.append(template.format(**dict(zip(fields, words))))
+    return tuple(dict.fromkeys(titles))
 
-def generate_books(n: int = 100) -> List[Book]:
+def generate_books(n: int = 100, rng: Optional[np.random.Generator] = None) -> List[Book]:
     """Generate sample books"""
     books = []
-    used_titles = set()
+    if rng is None:
+        rng = np.random.default_rng()
     
-    for _ in range(n):
-        # Generate unique title
-        attempts = 0
-        while attempts < 10:
-            template = random.choice(BOOK_TITLES_TEMPLATES)
-            title = template.format(
-                adjective=random.choice(ADJECTIVES),
-                noun=random.choice(NOUNS),
-                place=random.choice(PLACES)
-            )
-            if title not in used_titles:
-                used_titles.add(title)
-                break
-            attempts += 1
+    # Draw every random value up front as arrays; the loop below only
+    # indexes into them (as Python ints, via tolist) to build each Book
+    
+    # Unique titles: a shuffle of all possible titles, repeated only if n
+    # exceeds how many distinct titles exist
+    all_titles = _all_titles()
+    title_idx = np.resize(rng.permutation(len(all_titles)), n).tolist()
+    
+    first_name_idx = rng.integers(len(FIRST_NAMES), size=n).tolist()
+    last_name_idx = rng.integers(len(LAST_NAMES), size=n).tolist()
+    
+    # Select genres and subjects: draw the maximum count without replacement,
+    # then keep the first num_genres/num_subjects of each row
+    num_genres = rng.integers(1, 4, size=n).tolist()
+    genre_idx = _sample_rows(rng, n, len(GENRES), 3).tolist()
+    num_subjects = rng.integers(2, 5, size=n).tolist()
+    subject_idx = _sample_rows(rng, n, len(SUBJECTS), 4).tolist()
+    
+    # Determine reading level and a page count within its range
+    level_idx = rng.integers(len(READING_LEVELS), size=n)
+    page_counts = rng.integers(PAGE_RANGES[level_idx, 0], PAGE_RANGES[level_idx, 1] + 1).tolist()
+    level_idx = level_idx.tolist()
+    
+    style_idx = rng.integers(len(STORYTELLING_STYLES), size=n).tolist()
+    publication_years = rng.integers(2010, 2025, size=n).tolist()
+    available_copies = rng.integers(1, 6, size=n).tolist()
+    total_copies = rng.integers(2, 9, size=n).tolist()
+    isbns = generate_isbns(rng, n)
+    
+    for i in range(n):
+        title = all_titles[title_idx[i]]
         
         # Generate author name
-        author = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
-        
-        # Select genres and subjects
-        num_genres = random.randint(1, 3)
-        genres = random.sample(GENRES, num_genres)
-        num_subjects = random.randint(2, 4)
-        subjects = random.sample(SUBJECTS, num_subjects)
+        author = f"{FIRST_NAMES[first_name_idx[i]]} {LAST_NAMES[last_name_idx[i]]}"
         
-        # Determine reading level
-        reading_levels = ["K-2", "3-5", "6-8", "9-12"]
-        reading_level = random.choice(reading_levels)
+        genres = [GENRES[g] for g in genre_idx[i][:num_genres[i]]]
+        subjects = [SUBJECTS[s] for s in subject_idx[i][:num_subjects[i]]]
         
         # Generate description
         description = f"An engaging {genres[0].lower()} story about {subjects[0].lower()}. "
         description += f"This book explores themes of {', '.join(subjects[1:]).lower()} "
-        description += f"through {random.choice(['exciting', 'thoughtful', 'imaginative', 'compelling'])} storytelling."
-        
-        # Calculate page count based on reading level
-        page_ranges = {
-            "K-2": (20, 80),
-            "3-5": (80, 200),
-            "6-8": (150, 350),
-            "9-12": (200, 500)
-        }
-        min_pages, max_pages = page_ranges[reading_level]
-        page_count = random.randint(min_pages, max_pages)
+        description += f"through {STORYTELLING_STYLES[style_idx[i]]} storytelling."
         
         book = Book(
             book_id=generate_book_id(title, author),
             title=title,
             author=author,
-            isbn=generate_isbn(),
+            isbn=isbns[i],
             genre=genres,
             subject=subjects,
-            reading_level=reading_level,
+            reading_level=READING_LEVELS[level_idx[i]],
             description=description,
-            publication_year=random.randint(2010, 2024),
-            page_count=page_count,
-            available_copies=random.randint(1, 5),
-            total_copies=random.randint(2, 8)
+            publication_year=publication_years[i],
+            page_count=page_counts[i],
+            available_copies=available_copies[i],
+            total_copies=total_copies[i]
         )
         books.append(book)
     
     return books
 
-def generate_students(n: int = 50) -> List[Student]:
+def generate_students(n: int = 50, rng: Optional[random.Random] = None) -> List[Student]:
     """Generate sample students"""
     students = []
+    if rng is None:
+        rng = random.Random()
+    
+    # Batch the per-student draws; rng.sample below doesn't batch
+    first_names = rng.choices(FIRST_NAMES, k=n)
+    last_names = rng.choices(LAST_NAMES, k=n)
+    grade_levels = rng.choices(range(13), k=n)  # K-12
+    num_genres = rng.choices(range(1, 5), k=n)
+    num_interests = rng.choices(range(2, 6), k=n)
+    id_salts = rng.choices(range(1000, 10000), k=n)
     
-    for _ in range(n):
+    for i in range(n):
         # Generate student name
-        first_name = random.choice(FIRST_NAMES)
-        last_name = random.choice(LAST_NAMES)
-        full_name = f"{first_name} {last_name}"
-        
-        # Generate grade level (K-12)
-        grade_level = random.randint(0, 12)
+        full_name = f"{first_names[i]} {last_names[i]}"
+        grade_level = grade_levels[i]
         
         # Determine reading level based on grade
-        if grade_level <= 2:
-            reading_level = "K-2"
-        elif grade_level <= 5:
-            reading_level = "3-5"
-        elif grade_level <= 8:
-            reading_level = "6-8"
-        else:
-            reading_level = "9-12"
+        reading_level = READING_LEVEL_BY_GRADE[grade_level]
         
         # Generate preferences
-        num_genres = random.randint(1, 4)
-        preferred_genres = random.sample(GENRES, num_genres)
-        
-        num_interests = random.randint(2, 5)
-        interests = random.sample(INTERESTS, num_interests)
+        preferred_genres = rng.sample(GENRES, num_genres[i])
+        interests = rng.sample(INTERESTS, num_interests[i])
         
         student = Student(
-            student_id=generate_student_id(full_name, grade_level),
+            student_id=generate_student_id(full_name, grade_level, id_salts[i]),
             grade_level=grade_level,
             reading_level=reading_level,
             preferred_genres=preferred_genres,
@@ -202,129 +257,135 @@ def generate_students(n: int = 50) -> List[Student]:
 def generate_borrowing_history(
     students: List[Student], 
     books: List[Book], 
-    n_records: int = 500
+    n_records: int = 500,
+    rng: Optional[np.random.Generator] = None
 ) -> List[BorrowingRecord]:
     """Generate borrowing history records"""
-    records = []
-    start_date = datetime.now() - timedelta(days=365)
+    if rng is None:
+        rng = np.random.default_rng()
+    start64 = np.datetime64(datetime.now() - timedelta(days=365), 'us')
     
-    # Ensure each student has some history
-    for student in students:
-        # Number of books this student has borrowed
-        num_borrows = random.randint(2, 15)
-        
-        for _ in range(num_borrows):
-            # Select a book (prefer books matching student's reading level)
-            suitable_books = [b for b in books if b.reading_level == student.reading_level]
-            if not suitable_books:
-                suitable_books = books
-            
-            # 70% chance to pick from suitable books, 30% to explore
-            if random.random() < 0.7:
-                book = random.choice(suitable_books)
-            else:
-                book = random.choice(books)
-            
-            # Generate borrowing date
-            borrow_date = start_date + timedelta(days=random.randint(0, 365))
-            
-            # 80% of books are returned
-            return_date = None
-            completed = False
-            rating = None
-            
-            if random.random() < 0.8:
-                return_date = borrow_date + timedelta(days=random.randint(7, 30))
-                completed = random.random() < 0.7  # 70% completion rate
-                if completed:
-                    # Rate completed books
-                    rating = random.choices([3, 4, 5], weights=[0.2, 0.4, 0.4])[0]
-            
-            record = BorrowingRecord(
-                student_id=student.student_id,
-                book_id=book.book_id,
-                borrow_date=borrow_date,
-                return_date=return_date,
-                rating=rating,
-                completed=completed
-            )
-            records.append(record)
-            
-            # Add to student's reading history
-            if book.book_id not in student.reading_history:
-                student.reading_history.append(book.book_id)
+    # Every student borrows 2-15 books, then random records top up to n_records
+    num_borrows = rng.integers(2, 16, size=len(students))
+    student_idx = np.repeat(np.arange(len(students)), num_borrows)
+    n_extra = max(0, n_records - len(student_idx))
+    student_idx = np.concatenate([student_idx, rng.integers(len(students), size=n_extra)])
+    n_total = len(student_idx)
     
-    # Add more random records to reach target number
-    while len(records) < n_records:
-        student = random.choice(students)
-        book = random.choice(books)
-        
-        borrow_date = start_date + timedelta(days=random.randint(0, 365))
-        return_date = None
-        completed = False
-        rating = None
-        
-        if random.random() < 0.8:
-            return_date = borrow_date + timedelta(days=random.randint(7, 30))
-            completed = random.random() < 0.7
-            if completed:
-                rating = random.choices([3, 4, 5], weights=[0.2, 0.4, 0.4])[0]
+    # Draw every per-record random value up front as parallel arrays
+    # 70% of a student's own borrows come from their reading level, the rest explore
+    prefer_level = rng.random(n_total) < 0.7
+    prefer_level[n_total - n_extra:] = False
+    book_idx = rng.integers(len(books), size=n_total)
+    borrow_dates = start64 + rng.integers(0, 366, size=n_total).astype('timedelta64[D]')
+    returned = rng.random(n_total) < 0.8  # 80% of books are returned
+    return_dates = borrow_dates + rng.integers(7, 31, size=n_total).astype('timedelta64[D]')
+    completed = returned & (rng.random(n_total) < 0.7)  # 70% completion rate
+    # Only completed books get rated, so only draw ratings for those
+    ratings = np.zeros(n_total, dtype=np.int8)
+    ratings[completed] = rng.choice(RATING_VALUES, p=RATING_PROBABILITIES, size=completed.sum())
+    
+    # Swap in level-matched picks, one reading level at a time
+    # (levels without books keep the catalog-wide pick)
+    student_levels = np.array([student.reading_level for student in students])[student_idx]
+    books_by_level = defaultdict(list)
+    for i, book in enumerate(books):
+        books_by_level[book.reading_level].append(i)
+    for level, level_books in books_by_level.items():
+        mask = prefer_level & (student_levels == level)
+        book_idx[mask] = np.array(level_books)[rng.integers(len(level_books), size=mask.sum())]
+    
+    # Mirror each reading history in a set for O(1) "already read" checks
+    read_book_ids = {student.student_id: set(student.reading_history) for student in students}
+    
+    records = []
+    # tolist() on datetime64[us] converts the whole column to datetimes in C
+    for s, b, borrow_date, was_returned, return_date, was_completed, rating in zip(
+        student_idx.tolist(), book_idx.tolist(), borrow_dates.tolist(),
+        returned.tolist(), return_dates.tolist(), completed.tolist(), ratings.tolist()
+    ):
+        student = students[s]
+        book = books[b]
         
         record = BorrowingRecord(
             student_id=student.student_id,
             book_id=book.book_id,
             borrow_date=borrow_date,
-            return_date=return_date,
-            rating=rating,
-            completed=completed
+            return_date=return_date if was_returned else None,
+            rating=rating if was_completed else None,
+            completed=was_completed
         )
         records.append(record)
         
-        if book.book_id not in student.reading_history:
+        # Add to student's reading history
+        if book.book_id not in read_book_ids[student.student_id]:
+            read_book_ids[student.student_id].add(book.book_id)
             student.reading_history.append(book.book_id)
     
     return records
 
-def generate_sample_data() -> Tuple[List[Book], List[Student], List[BorrowingRecord]]:
-    """Generate complete sample dataset"""
-    books = generate_books(150)
-    students = generate_students(75)
-    records = generate_borrowing_history(students, books, 1000)
+def generate_sample_data(seed: Optional[int] = None) -> Tuple[List[Book], List[Student], List[BorrowingRecord]]:
+    """Generate complete sample dataset (reproducible when seeded, e.g. via SMARTREADS_SEED)"""
+    if seed is None and os.getenv('SMARTREADS_SEED'):
+        seed = int(os.environ['SMARTREADS_SEED'])
+    
+    # Dedicated generators rather than the shared global random state
+    rng = np.random.default_rng(seed)
+    books = generate_books(150, rng=rng)
+    students = generate_students(75, rng=random.Random(seed))
+    records = generate_borrowing_history(students, books, 1000, rng=rng)
     return books, students, records
 
-def save_sample_data():
-    """Generate and save sample data to JSON files"""
+def save_sample_data(data_format: str = "json"):
+    """Generate and save sample data to JSON (default) or Parquet files"""
+    if data_format not in ("json", "parquet"):
+        raise ValueError(f"Unsupported data format: {data_format}")
+    
     books, students, records = generate_sample_data()
     
-    # Convert to JSON-serializable format
+    # Convert to JSON-serializable format (orjson encodes the datetimes
+    # itself, in the ISO 8601 form datetime.fromisoformat reads back)
     books_data = [book.to_dict() for book in books]
     students_data = [student.to_dict() for student in students]
     records_data = [
         {
             'student_id': r.student_id,
             'book_id': r.book_id,
-            'borrow_date': r.borrow_date.isoformat(),
-            'return_date': r.return_date.isoformat() if r.return_date else None,
+            'borrow_date': r.borrow_date,
+            'return_date': r.return_date,
             'rating': r.rating,
             'completed': r.completed
         }
         for r in records
     ]
     
-    # Save to files
-    with open('data/books.json', 'w') as f:
-        json.dump(books_data, f, indent=2)
-    
-    with open('data/students.json', 'w') as f:
-        json.dump(students_data, f, indent=2)
+    datasets = {
+        'books': books_data,
+        'students': students_data,
+        'borrowing_history': records_data
+    }
     
-    with open('data/borrowing_history.json', 'w') as f:
-        json.dump(records_data, f, indent=2)
+    if data_format == "parquet":
+        # Columnar files store each key once and dictionary-encode the
+        # repeated categorical values; pyarrow is only needed for this path
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for name, rows in datasets.items():
+            pq.write_table(pa.Table.from_pylist(rows), f'data/{name}.parquet', compression='zstd')
+    else:
+        # Compact output by default; indenting makes the files 25-60% larger, so
+        # it is opt-in for when a human needs to read them
+        json_options = orjson.OPT_INDENT_2 if os.getenv('SMARTREADS_PRETTY_JSON') == '1' else 0
+        
+        # Save to files (each is encoded to one buffer and written in one call)
+        for name, rows in datasets.items():
+            with open(f'data/{name}.json', 'wb') as f:
+                f.write(orjson.dumps(rows, option=json_options))
     
     print(f"Generated and saved:")
-    print(f"  - {len(books)} books to data/books.json")
-    print(f"  - {len(students)} students to data/students.json")
-    print(f"  - {len(records)} borrowing records to data/borrowing_history.json")
+    print(f"  - {len(books)} books to data/books.{data_format}")
+    print(f"  - {len(students)} students to data/students.{data_format}")
+    print(f"  - {len(records)} borrowing records to data/borrowing_history.{data_format}")
     
     # Generate some statistics
     print("\nDataset Statistics:")
@@ -334,10 +395,8 @@ def save_sample_data():
     print(f"  - Books with ratings: {sum(1 for r in records if r.rating) / len(records):.1%}")
 
 if __name__ == "__main__":
-    import os
-    
     # Create data directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
     
-    # Generate and save sample data
-    save_sample_data()
+    # Generate and save sample data (SMARTREADS_DATA_FORMAT=parquet for columnar files)
+    save_sample_data(data_format=os.getenv('SMARTREADS_DATA_FORMAT', 'json'))
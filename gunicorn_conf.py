@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for SmartReads
+Runs uvicorn workers forked from a master that has already built the engine:
+
+    gunicorn -c gunicorn_conf.py app:app
+
+With preload_app the catalog, student profiles and trained models are loaded
+once in the master and shared copy-on-write with every worker, instead of
+each worker loading them again. Like `python app.py`, it runs a single
+worker unless WEB_CONCURRENCY is set: with more, /api/regenerate-data (and
+its status) only reaches the worker that serves the request, while the
+others keep serving the previous students.
+"""
+
+import gc
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+# One worker by default so data regeneration stays consistent; raise it for
+# read-only deployments
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# UvicornWorker runs on uvloop/httptools when they are installed (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+def on_starting(server):
+    """Build the recommendation engine in the master before workers fork"""
+    from app import initialize_engine
+    initialize_engine()
+    # Move everything loaded so far out of the GC's reach so collections in
+    # the workers don't write to (and so copy) the shared pages
+    gc.freeze()
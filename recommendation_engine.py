@@ -6,22 +6,77 @@ Core recommendation system combining collaborative filtering, content-based filt
 import json
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from typing import List, Dict, Tuple, Optional, Any
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import random
 from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+import heapq
 import logging
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
 import hashlib
 
+try:
+    import simsimd  # optional: SIMD cosine kernels for the content-based scan
+except ImportError:
+    simsimd = None
+
+try:
+    import hnswlib  # optional: approximate nearest-neighbour index for large catalogs
+except ImportError:
+    hnswlib = None
+
+# Below this many books the exact content-based scan is faster than an ANN query
+ANN_MIN_BOOKS = 5000
+
+# Above this many user x book cells the similarity products run on a CUDA
+# GPU through torch, when both are available; smaller ones stay on the CPU
+GPU_MIN_CELLS = 10_000_000
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, as a stable descending
+    sort would order them (ties go to the lower index), but in O(N + k log k)
+    """
+    if k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]  # k-th highest value
+    above = np.flatnonzero(scores > kth)
+    top = np.concatenate([above, np.flatnonzero(scores == kth)[:k - len(above)]])
+    return top[np.argsort(-scores[top], kind='stable')]
+
+def _gram(vectors: sp.spmatrix) -> np.ndarray:
+    """Dense matrix of pairwise dot products between the rows of a sparse matrix"""
+    if vectors.shape[0] * vectors.shape[1] > GPU_MIN_CELLS:
+        try:
+            import torch  # optional, only needed for large matrices
+        except ImportError:
+            torch = None
+        if torch is not None and torch.cuda.is_available():
+            # Ship only the CSR arrays and densify on the device, so the host
+            # never holds a dense copy; the float32 result is kept as is
+            csr = sp.csr_matrix(vectors, dtype=np.float32)
+            x = torch.sparse_csr_tensor(
+                torch.from_numpy(csr.indptr.astype(np.int64)),
+                torch.from_numpy(csr.indices.astype(np.int64)),
+                torch.from_numpy(csr.data),
+                size=csr.shape
+            ).cuda().to_dense()
+            return (x @ x.T).cpu().numpy()
+    return (vectors @ vectors.T).toarray()
+
+@dataclass(slots=True)
 class Book:
     """Represents a book in the library catalog"""
     book_id: str
@@ -62,7 +117,7 @@ class Book:
             'rating_count': self.rating_count
         }
 
-@dataclass
+@dataclass(slots=True)
 class Student:
     """Represents a student user"""
     student_id: str
@@ -83,7 +138,7 @@ class Student:
             'reading_history': self.reading_history
         }
 
-@dataclass
+@dataclass(slots=True)
 class BorrowingRecord:
     """Represents a book borrowing transaction"""
     student_id: str
@@ -93,7 +148,7 @@ class BorrowingRecord:
     rating: Optional[int] = None  # 1-5 scale
     completed: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Recommendation:
     """Represents a book recommendation with explanation"""
     book: Book
@@ -117,89 +172,106 @@ class CollaborativeFilter:
     
     def __init__(self):
         self.user_item_matrix = None
-        self.user_similarity_matrix = None
-        self.item_similarity_matrix = None
+        self.user_index: Dict[str, int] = {}
+        self.book_index: Dict[str, int] = {}
+        self.book_ids: List[str] = []
+        self.book_popularity: Optional[np.ndarray] = None  # column sums, for cold start
+        self.user_similarity_matrix: Optional[np.ndarray] = None  # rows/columns follow user_index
+        self.item_similarity_matrix: Optional[np.ndarray] = None  # rows/columns follow book_index
         self.svd_model = None
         
     def fit(self, borrowing_records: List[BorrowingRecord]):
         """Train the collaborative filtering model"""
         logger.info("Training collaborative filter...")
         
-        # Create user-item matrix
-        user_ids = list(set([r.student_id for r in borrowing_records]))
-        book_ids = list(set([r.book_id for r in borrowing_records]))
-        
-        # Initialize matrix
-        self.user_item_matrix = pd.DataFrame(
-            0, 
-            index=user_ids, 
-            columns=book_ids
+        # Collect one (user, book, value) triple per record; factorize codes
+        # users and books in order of first appearance in a single hashing pass
+        rows, user_ids = pd.factorize(np.array([r.student_id for r in borrowing_records], dtype=object))
+        cols, book_ids = pd.factorize(np.array([r.book_id for r in borrowing_records], dtype=object))
+        user_ids = user_ids.tolist()
+        book_ids = book_ids.tolist()
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.book_index = {book_id: i for i, book_id in enumerate(book_ids)}
+        self.book_ids = book_ids
+        ratings = np.array([r.rating or 0 for r in borrowing_records], dtype=np.float64)
+        completed = np.array([r.completed for r in borrowing_records], dtype=bool)
+        
+        # Implicit feedback: 1 for borrowed, 1.2 bonus for completed books,
+        # normalized rating when the book was rated
+        values = np.where(ratings > 0, ratings / 5.0, np.where(completed, 1.2, 1.0))
+        
+        # A repeat borrow overwrites the earlier value, so keep the last triple
+        # per cell (the sparse constructor would otherwise sum duplicates)
+        cells = rows * len(book_ids) + cols
+        _, last_from_end = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last_from_end
+        
+        # Sparse user-item matrix: memory and similarity work scale with the
+        # number of borrows rather than users x books
+        self.user_item_matrix = sp.csr_matrix(
+            (values[last], (rows[last], cols[last])),
+            shape=(len(user_ids), len(book_ids))
         )
+        self.book_popularity = np.asarray(self.user_item_matrix.sum(axis=0)).ravel()
         
-        # Fill matrix with ratings (implicit feedback: 1 for borrowed)
-        for record in borrowing_records:
-            value = 1  # Base value for borrowing
-            if record.rating:
-                value = record.rating / 5.0  # Normalize rating
-            elif record.completed:
-                value = 1.2  # Bonus for completed books
-            
-            self.user_item_matrix.loc[record.student_id, record.book_id] = value
-        
-        # Calculate user similarity matrix (cosine similarity)
+        # Calculate user similarity matrix (cosine similarity): L2-normalize
+        # the rows once, then a single product gives every pairwise cosine
         if len(user_ids) > 1:
-            user_vectors = self.user_item_matrix.values
-            self.user_similarity_matrix = cosine_similarity(user_vectors)
-            self.user_similarity_matrix = pd.DataFrame(
-                self.user_similarity_matrix,
-                index=user_ids,
-                columns=user_ids
-            )
+            user_vectors = normalize(self.user_item_matrix)
+            self.user_similarity_matrix = _gram(user_vectors)
         
-        # Calculate item similarity matrix
+        # Calculate item similarity matrix (same, over normalized columns)
         if len(book_ids) > 1:
-            item_vectors = self.user_item_matrix.T.values
-            self.item_similarity_matrix = cosine_similarity(item_vectors)
-            self.item_similarity_matrix = pd.DataFrame(
-                self.item_similarity_matrix,
-                index=book_ids,
-                columns=book_ids
-            )
+            item_vectors = normalize(self.user_item_matrix, axis=0)
+            self.item_similarity_matrix = _gram(item_vectors.T)
         
         # Train SVD for matrix factorization (handle cold start better)
         if len(user_ids) > 2 and len(book_ids) > 2:
             self.svd_model = TruncatedSVD(n_components=min(10, len(user_ids)-1, len(book_ids)-1))
-            self.svd_model.fit(self.user_item_matrix.values)
+            self.svd_model.fit(self.user_item_matrix)  # works on the CSR matrix directly
             
         logger.info(f"Collaborative filter trained with {len(user_ids)} users and {len(book_ids)} books")
     
+    def _user_books(self, user_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Book indices and values stored in one user's row of the matrix"""
+        start, end = self.user_item_matrix.indptr[user_idx:user_idx + 2]
+        return self.user_item_matrix.indices[start:end], self.user_item_matrix.data[start:end]
+    
     def recommend(self, student_id: str, n_recommendations: int = 10) -> List[Tuple[str, float]]:
         """Generate recommendations using collaborative filtering"""
         if self.user_item_matrix is None:
             return []
         
-        if student_id not in self.user_item_matrix.index:
+        if student_id not in self.user_index:
             # Cold start - return popular items
-            popularity = self.user_item_matrix.sum(axis=0)
-            return list(zip(popularity.nlargest(n_recommendations).index, 
-                          popularity.nlargest(n_recommendations).values))
+            top = _top_k(self.book_popularity, n_recommendations)
+            return list(zip([self.book_ids[i] for i in top.tolist()], self.book_popularity[top].tolist()))
         
         # Get similar users
         if self.user_similarity_matrix is not None:
-            similar_users = self.user_similarity_matrix[student_id].nlargest(6).index[1:]  # Top 5 similar users
+            similarities = self.user_similarity_matrix[self.user_index[student_id]]
+            similar = _top_k(similarities, 6)[1:]  # Top 5 similar users
             
-            # Aggregate preferences of similar users
-            recommendations = defaultdict(float)
-            for user in similar_users:
-                similarity_score = self.user_similarity_matrix.loc[student_id, user]
-                user_books = self.user_item_matrix.loc[user]
-                for book_id, rating in user_books[user_books > 0].items():
-                    if self.user_item_matrix.loc[student_id, book_id] == 0:  # Not already read
-                        recommendations[book_id] += rating * similarity_score
+            # Gather the similar users' rows from the CSR arrays
+            rows = [self._user_books(user) for user in similar.tolist()]
+            book_indices = np.concatenate([indices for indices, _ in rows])
+            weights = np.repeat(similarities[similar], [len(indices) for indices, _ in rows])
+            weighted_ratings = np.concatenate([ratings for _, ratings in rows]) * weights
             
-            # Sort and return top N
-            sorted_recs = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-            return sorted_recs[:n_recommendations]
+            # Aggregate preferences of similar users: a weighted bincount sums
+            # each weighted rating into its book's score
+            scores = np.bincount(book_indices, weights=weighted_ratings, minlength=len(self.book_ids))
+            
+            # Candidates are books a similar user read and this student hasn't,
+            # in the order the neighbours list them (which breaks score ties)
+            unread = np.ones(len(self.book_ids), dtype=bool)
+            unread[self._user_books(self.user_index[student_id])[0]] = False
+            candidates = pd.unique(book_indices)
+            candidates = candidates[unread[candidates]]
+            
+            # Select the top N without sorting every candidate
+            top = candidates[_top_k(scores[candidates], n_recommendations)]
+            return list(zip([self.book_ids[i] for i in top.tolist()], scores[top].tolist()))
         
         return []
 
@@ -207,26 +279,40 @@ class ContentBasedFilter:
     """Content-based filtering recommendation engine"""
     
     def __init__(self):
-        self.tfidf_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        self.tfidf_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english', dtype=np.float32)
         self.book_features = None
+        self.dense_features = None  # dense copy for simsimd, when installed
+        self.ann_index = None  # hnswlib index, for catalogs of ANN_MIN_BOOKS or more
         self.book_ids = []
+        self.book_id_to_idx: Dict[str, int] = {}
         
     def fit(self, books: List[Book]):
         """Train the content-based filter"""
         logger.info("Training content-based filter...")
         
         # Create feature text for each book
-        feature_texts = []
-        self.book_ids = []
+        feature_texts = [
+            ' '.join((book.title, book.author, *book.genre, *book.subject, book.description))
+            for book in books
+        ]
+        self.book_ids = [book.book_id for book in books]
         
-        for book in books:
-            feature_text = f"{book.title} {book.author} {' '.join(book.genre)} {' '.join(book.subject)} {book.description}"
-            feature_texts.append(feature_text)
-            self.book_ids.append(book.book_id)
+        self.book_id_to_idx = {book_id: i for i, book_id in enumerate(self.book_ids)}
         
         # Create TF-IDF matrix
         if feature_texts:
-            self.book_features = self.tfidf_vectorizer.fit_transform(feature_texts)
+            # Rows are L2-normalized once here, so a dot product with a
+            # normalized profile is already the cosine similarity
+            self.book_features = normalize(self.tfidf_vectorizer.fit_transform(feature_texts), copy=False)
+            if simsimd is not None:
+                self.dense_features = self.book_features.toarray()
+            self.ann_index = None
+            if hnswlib is not None and len(books) >= ANN_MIN_BOOKS:
+                dense = self.dense_features if self.dense_features is not None else self.book_features.toarray()
+                self.ann_index = hnswlib.Index(space='cosine', dim=dense.shape[1])
+                self.ann_index.init_index(max_elements=len(dense), ef_construction=100, M=16)
+                self.ann_index.add_items(dense, np.arange(len(dense)))
+                self.ann_index.set_ef(100)
             logger.info(f"Content-based filter trained with {len(books)} books")
         
     def recommend(self, student: Student, books_dict: Dict[str, Book], n_recommendations: int = 10) -> List[Tuple[str, float]]:
@@ -235,36 +321,76 @@ class ContentBasedFilter:
             return []
         
         # Get indices of books in reading history
-        history_indices = []
-        for book_id in student.reading_history[-10:]:  # Use last 10 books
-            if book_id in self.book_ids:
-                history_indices.append(self.book_ids.index(book_id))
+        history_indices = [
+            self.book_id_to_idx[book_id]
+            for book_id in student.reading_history[-10:]  # Use last 10 books
+            if book_id in self.book_id_to_idx
+        ]
         
         if not history_indices:
             return []
         
         # Calculate average feature vector of reading history
         history_vectors = self.book_features[history_indices]
-        avg_profile = np.asarray(history_vectors.mean(axis=0)).reshape(1, -1)
+        avg_profile = normalize(np.asarray(history_vectors.mean(axis=0)).reshape(1, -1))
+        read_indices = [self.book_id_to_idx[b] for b in student.reading_history if b in self.book_id_to_idx]
+        
+        # Large catalogs: ask the ANN index for enough neighbours to cover the
+        # books already read, instead of scoring every book
+        if self.ann_index is not None:
+            read = set(read_indices)
+            k = min(n_recommendations + len(read), len(self.book_ids))
+            labels, distances = self.ann_index.knn_query(avg_profile.astype(np.float32), k=k)
+            return [
+                (self.book_ids[i], 1.0 - d)
+                for i, d in zip(labels[0].tolist(), distances[0].tolist())
+                if i not in read
+            ][:n_recommendations]
         
         # Calculate similarity with all books
-        similarities = cosine_similarity(avg_profile, self.book_features).flatten()
-        
-        # Filter out already read books and sort
-        recommendations = []
-        for idx, score in enumerate(similarities):
-            book_id = self.book_ids[idx]
-            if book_id not in student.reading_history:
-                recommendations.append((book_id, float(score)))
+        if self.dense_features is not None:
+            distances = simsimd.cdist(avg_profile.astype(np.float32), self.dense_features, metric='cosine')
+            similarities = 1 - np.asarray(distances).ravel()
+        else:
+            similarities = self.book_features @ avg_profile.ravel()
         
-        recommendations.sort(key=lambda x: x[1], reverse=True)
-        return recommendations[:n_recommendations]
+        # Filter out already read books, then select the top N without
+        # sorting the whole catalog
+        similarities[read_indices] = -np.inf
+        top = _top_k(similarities, min(n_recommendations, len(self.book_ids) - len(set(read_indices))))
+        return list(zip([self.book_ids[i] for i in top.tolist()], similarities[top].tolist()))
 
 class LLMRecommender:
     """LLM-based recommendation enhancement"""
     
     def __init__(self, use_mock: bool = True):
         self.use_mock = use_mock
+        # Lowercase word sets used by the mock, precomputed when the engine
+        # loads its catalog and students (keyed by book_id / student_id)
+        self.book_words: Dict[str, frozenset] = {}
+        self.student_keywords: Dict[str, frozenset] = {}
+        self.student_genres: Dict[str, frozenset] = {}
+    
+    def index_books(self, books: List[Book]):
+        """Precompute the description and subject words of each book"""
+        for book in books:
+            self.book_words[book.book_id] = self._book_words(book)
+    
+    def index_students(self, students: List[Student]):
+        """Precompute the interest keywords and preferred genres of each student"""
+        for student in students:
+            self.student_keywords[student.student_id] = self._student_keywords(student)
+            self.student_genres[student.student_id] = frozenset(student.preferred_genres)
+    
+    @staticmethod
+    def _book_words(book: Book) -> frozenset:
+        description_words = book.description.lower().split()
+        subject_words = (word.lower() for subject in book.subject for word in subject.split())
+        return frozenset(description_words).union(subject_words)
+    
+    @staticmethod
+    def _student_keywords(student: Student) -> frozenset:
+        return frozenset(word.lower() for interest in student.interests for word in interest.split())
         
     def enhance_recommendation(self, student: Student, book: Book, base_score: float) -> Tuple[float, str]:
         """
@@ -277,13 +403,39 @@ class LLMRecommender:
             # In production, this would call actual LLM API
             return self._real_llm_enhancement(student, book, base_score)
     
-    def _mock_llm_enhancement(self, student: Student, book: Book, base_score: float) -> Tuple[float, str]:
+    def enhance_recommendations_batch(self, student: Student, books: List[Book], base_scores: List[float]) -> List[Tuple[float, str]]:
+        """
+        Enhance several recommendations for one student
+        The student's profile is resolved once for the whole list
+        """
+        if self.use_mock:
+            preferred_genres, interest_keywords = self._student_profile(student)
+            return [
+                self._mock_llm_enhancement(student, book, base_score, preferred_genres, interest_keywords)
+                for book, base_score in zip(books, base_scores)
+            ]
+        # In production, this would send the books to the LLM in one prompt
+        return [self._real_llm_enhancement(student, book, base_score) for book, base_score in zip(books, base_scores)]
+    
+    def _student_profile(self, student: Student) -> Tuple[frozenset, frozenset]:
+        """Preferred genres and interest keywords of a student"""
+        preferred_genres = self.student_genres.get(student.student_id) or frozenset(student.preferred_genres)
+        interest_keywords = self.student_keywords.get(student.student_id)
+        if interest_keywords is None:
+            interest_keywords = self._student_keywords(student)
+        return preferred_genres, interest_keywords
+    
+    def _mock_llm_enhancement(self, student: Student, book: Book, base_score: float,
+                              preferred_genres: Optional[frozenset] = None,
+                              interest_keywords: Optional[frozenset] = None) -> Tuple[float, str]:
         """Mock LLM enhancement for demo purposes"""
         reasons = []
         score_boost = 0.0
+        if preferred_genres is None or interest_keywords is None:
+            preferred_genres, interest_keywords = self._student_profile(student)
         
         # Check genre match
-        matched_genres = [g for g in book.genre if g in student.preferred_genres]
+        matched_genres = [g for g in book.genre if g in preferred_genres]
         if matched_genres:
             score_boost += 0.1
             reasons.append(f"matches your preferred genre of {matched_genres[0]}")
@@ -301,14 +453,14 @@ class LLMRecommender:
             reasons.append("will challenge you at just the right level")
         
         # Check interests alignment
-        interest_keywords = set(word.lower() for interest in student.interests for word in interest.split())
-        description_words = set(book.description.lower().split())
-        subject_words = set(word.lower() for subject in book.subject for word in subject.split())
+        book_words = self.book_words.get(book.book_id)
+        if book_words is None:
+            book_words = self._book_words(book)
         
-        matched_interests = interest_keywords & (description_words | subject_words)
+        matched_interests = interest_keywords & book_words
         if matched_interests:
             score_boost += 0.15
-            matched = list(matched_interests)[0]
+            matched = next(iter(matched_interests))
             reasons.append(f"relates to your interest in {matched}")
         
         # Generate explanation
@@ -366,6 +518,17 @@ class SmartReadsRecommendationEngine:
         self.books_catalog: Dict[str, Book] = {}
         self.students: Dict[str, Student] = {}
         self.borrowing_records: List[BorrowingRecord] = []
+        # Catalog columns (one entry per book, in catalog order) used by the
+        # popularity and diversity passes instead of walking Book objects
+        self.book_id_list: List[str] = []
+        self.book_position: Dict[str, int] = {}
+        self.popularity_scores = np.zeros(0)
+        self.book_levels = np.zeros(0, dtype=np.int8)
+        self.genre_codes: Dict[str, int] = {}
+        self.book_genres = np.zeros((0, 0), dtype=bool)  # books x genres indicator
+        # Filter results per (student, reading history, n); cleared whenever
+        # the catalog or borrowing history is reloaded
+        self._similar_books = lru_cache(maxsize=1024)(self._compute_similar_books)
     
     def is_reading_level_appropriate(self, student_level: str, book_level: str, allow_stretch: bool = True) -> bool:
         """
@@ -392,29 +555,48 @@ class SmartReadsRecommendationEngine:
         """Load books into the catalog"""
         for book in books:
             self.books_catalog[book.book_id] = book
+        catalog = list(self.books_catalog.values())
+        self.book_id_list = list(self.books_catalog)
+        self.book_position = {book_id: i for i, book_id in enumerate(self.book_id_list)}
+        self.popularity_scores = np.array([book.popularity_score for book in catalog], dtype=np.float64)
+        self.book_levels = np.array(
+            [self.READING_LEVELS.get(book.reading_level, 0) for book in catalog], dtype=np.int8
+        )
+        # Genres as a books x genres indicator matrix (there are only a
+        # handful of genres, so a dense bool array is the cheapest to mask)
+        self.genre_codes = {}
+        genre_indices = [self.genre_codes.setdefault(genre, len(self.genre_codes)) for book in catalog for genre in book.genre]
+        self.book_genres = np.zeros((len(catalog), len(self.genre_codes)), dtype=bool)
+        self.book_genres[np.repeat(np.arange(len(catalog)), [len(book.genre) for book in catalog]), genre_indices] = True
         self.content_filter.fit(books)
+        self.llm_recommender.index_books(books)
+        self._similar_books.cache_clear()
         logger.info(f"Loaded {len(books)} books into catalog")
         
     def load_students(self, students: List[Student]):
         """Load student profiles"""
         for student in students:
             self.students[student.student_id] = student
+        self.llm_recommender.index_students(students)
         logger.info(f"Loaded {len(students)} student profiles")
         
     def load_borrowing_history(self, records: List[BorrowingRecord]):
         """Load borrowing history"""
         self.borrowing_records = records
         self.collaborative_filter.fit(records)
-        
-        # Update popularity scores
-        borrow_counts = defaultdict(int)
-        for record in records:
-            borrow_counts[record.book_id] += 1
-        
-        max_count = max(borrow_counts.values()) if borrow_counts else 1
-        for book_id, count in borrow_counts.items():
-            if book_id in self.books_catalog:
-                self.books_catalog[book_id].popularity_score = count / max_count
+        self._similar_books.cache_clear()
+        
+        # Update popularity scores: count borrows per book, then scatter them
+        # into the catalog-ordered array (and the borrowed books' attributes)
+        if records:
+            codes, borrowed_ids = pd.factorize(np.array([r.book_id for r in records], dtype=object))
+            borrow_counts = np.bincount(codes)
+            positions = pd.Index(self.book_id_list, dtype=object).get_indexer(borrowed_ids)
+            in_catalog = positions >= 0
+            scores = borrow_counts[in_catalog] / borrow_counts.max()
+            self.popularity_scores[positions[in_catalog]] = scores
+            for book_id, score in zip(borrowed_ids[in_catalog].tolist(), scores.tolist()):
+                self.books_catalog[book_id].popularity_score = score
         
         # Calculate average ratings
         rating_sums = defaultdict(float)
@@ -432,6 +614,13 @@ class SmartReadsRecommendationEngine:
         
         logger.info(f"Loaded {len(records)} borrowing records")
     
+    def _compute_similar_books(self, student_id: str, history: Tuple[str, ...], n: int) -> Tuple[Tuple[Tuple[str, float], ...], Tuple[Tuple[str, float], ...]]:
+        """Collaborative and content-based candidates; history is part of the cache key"""
+        student = self.students[student_id]
+        collab_recs = tuple(self.collaborative_filter.recommend(student_id, n))
+        content_recs = tuple(self.content_filter.recommend(student, self.books_catalog, n))
+        return collab_recs, content_recs
+    
     def recommend(self, student_id: str, n_recommendations: int = 10) -> List[Recommendation]:
         """
         Generate personalized book recommendations
@@ -444,47 +633,60 @@ class SmartReadsRecommendationEngine:
         
         student = self.students[student_id]
         recommendations = []
+        seen_book_ids = set()  # Books already in recommendations
+        
+        collab_recs, content_recs = self._similar_books(
+            student_id, tuple(student.reading_history), n_recommendations * 3
+        )
         
         # Strategy 1: Collaborative Filtering (with reading level filter)
-        collab_recs = self.collaborative_filter.recommend(student_id, n_recommendations * 3)
-        collab_count = 0
+        collab_books = []
+        collab_scores = []
         for book_id, score in collab_recs:
-            if collab_count >= n_recommendations // 2:
+            if len(collab_books) >= n_recommendations // 2:
                 break
             if book_id in self.books_catalog:
                 book = self.books_catalog[book_id]
                 # Filter by reading level appropriateness
                 if self.is_reading_level_appropriate(student.reading_level, book.reading_level):
-                    enhanced_score, explanation = self.llm_recommender.enhance_recommendation(student, book, score)
-                    recommendations.append(Recommendation(
-                        book=book,
-                        score=enhanced_score,
-                        reason=explanation,
-                        strategy='collaborative',
-                        confidence=min(1.0, len(student.reading_history) / 10)  # Higher confidence with more history
-                    ))
-                    collab_count += 1
+                    collab_books.append(book)
+                    collab_scores.append(score)
+                    seen_book_ids.add(book_id)
+        
+        enhanced = self.llm_recommender.enhance_recommendations_batch(student, collab_books, collab_scores)
+        for book, (enhanced_score, explanation) in zip(collab_books, enhanced):
+            recommendations.append(Recommendation(
+                book=book,
+                score=enhanced_score,
+                reason=explanation,
+                strategy='collaborative',
+                confidence=min(1.0, len(student.reading_history) / 10)  # Higher confidence with more history
+            ))
         
         # Strategy 2: Content-Based Filtering (with reading level filter)
-        content_recs = self.content_filter.recommend(student, self.books_catalog, n_recommendations * 3)
-        content_count = 0
+        content_books = []
+        content_scores = []
         for book_id, score in content_recs:
-            if content_count >= n_recommendations // 2:
+            if len(content_books) >= n_recommendations // 2:
                 break
             if book_id in self.books_catalog:
                 book = self.books_catalog[book_id]
                 # Avoid duplicates and filter by reading level
-                if not any(r.book.book_id == book_id for r in recommendations):
+                if book_id not in seen_book_ids:
                     if self.is_reading_level_appropriate(student.reading_level, book.reading_level):
-                        enhanced_score, explanation = self.llm_recommender.enhance_recommendation(student, book, score)
-                        recommendations.append(Recommendation(
-                            book=book,
-                            score=enhanced_score,
-                            reason=explanation,
-                            strategy='content',
-                            confidence=min(1.0, len(student.reading_history) / 5)
-                        ))
-                        content_count += 1
+                        content_books.append(book)
+                        content_scores.append(score)
+                        seen_book_ids.add(book_id)
+        
+        enhanced = self.llm_recommender.enhance_recommendations_batch(student, content_books, content_scores)
+        for book, (enhanced_score, explanation) in zip(content_books, enhanced):
+            recommendations.append(Recommendation(
+                book=book,
+                score=enhanced_score,
+                reason=explanation,
+                strategy='content',
+                confidence=min(1.0, len(student.reading_history) / 5)
+            ))
         
         # Strategy 3: Diversity Enhancement - Add books from unexplored genres (with reading level filter)
         if len(recommendations) < n_recommendations:
@@ -493,25 +695,38 @@ class SmartReadsRecommendationEngine:
                 if book_id in self.books_catalog:
                     explored_genres.update(self.books_catalog[book_id].genre)
             
-            for book in self.books_catalog.values():
-                if book.book_id not in student.reading_history:
-                    new_genres = set(book.genre) - explored_genres
-                    # Filter by reading level appropriateness
-                    if new_genres and self.is_reading_level_appropriate(student.reading_level, book.reading_level):
-                        recommendations.append(Recommendation(
-                            book=book,
-                            score=0.7 + book.popularity_score * 0.3,
-                            reason=f"Explore a new genre: {list(new_genres)[0]}. This highly-rated book will broaden your reading horizons.",
-                            strategy='diversity',
-                            confidence=0.6
-                        ))
-                        if len(recommendations) >= n_recommendations:
-                            break
+            # Candidate mask over the catalog columns: appropriate reading
+            # level, at least one unexplored genre, not read or already picked
+            level = self.READING_LEVELS.get(student.reading_level, 0)
+            unexplored = [code for genre, code in self.genre_codes.items() if genre not in explored_genres]
+            mask = (self.book_levels >= level) & (self.book_levels <= level + 1) & self.book_genres[:, unexplored].any(axis=1)
+            mask[[self.book_position[b] for b in chain(student.reading_history, seen_book_ids) if b in self.book_position]] = False
+            
+            for i in np.flatnonzero(mask)[:n_recommendations - len(recommendations)].tolist():
+                book = self.books_catalog[self.book_id_list[i]]
+                new_genres = set(book.genre) - explored_genres
+                recommendations.append(Recommendation(
+                    book=book,
+                    score=0.7 + book.popularity_score * 0.3,
+                    reason=f"Explore a new genre: {next(iter(new_genres))}. This highly-rated book will broaden your reading horizons.",
+                    strategy='diversity',
+                    confidence=0.6
+                ))
         
         # Sort by score and return top N
         recommendations.sort(key=lambda x: x.score, reverse=True)
         return recommendations[:n_recommendations]
     
+    def recommend_batch(self, student_ids: List[str], n_recommendations: int = 10) -> Dict[str, List[Recommendation]]:
+        """
+        Generate recommendations for several students in one call
+        Each distinct student is scored once, however often it is requested
+        """
+        return {
+            student_id: self.recommend(student_id, n_recommendations)
+            for student_id in dict.fromkeys(student_ids)
+        }
+    
     def _get_popular_books(self, n: int, student_reading_level: Optional[str] = None) -> List[Recommendation]:
         """
         Fallback to popular books for cold start
@@ -520,20 +735,17 @@ class SmartReadsRecommendationEngine:
             n: Number of recommendations to return
             student_reading_level: If provided, filter books by reading level appropriateness
         """
-        # Filter books by reading level if provided
+        # Filter books by reading level if provided: at the student's level
+        # or one above, as in is_reading_level_appropriate
         if student_reading_level:
-            available_books = [
-                book for book in self.books_catalog.values()
-                if self.is_reading_level_appropriate(student_reading_level, book.reading_level)
-            ]
+            level = self.READING_LEVELS.get(student_reading_level, 0)
+            candidates = np.flatnonzero((self.book_levels >= level) & (self.book_levels <= level + 1))
         else:
-            available_books = list(self.books_catalog.values())
+            candidates = np.arange(len(self.book_id_list))
         
-        popular_books = sorted(
-            available_books, 
-            key=lambda x: x.popularity_score, 
-            reverse=True
-        )[:n]
+        # Top-n selection without sorting the whole catalog
+        top = candidates[_top_k(self.popularity_scores[candidates], n)]
+        popular_books = [self.books_catalog[self.book_id_list[i]] for i in top.tolist()]
         
         return [
             Recommendation(
@@ -564,19 +776,20 @@ class SmartReadsRecommendationEngine:
         total_books = len(self.books_catalog)
         total_borrows = len(self.borrowing_records)
         
-        # Calculate reading diversity
+        # One pass over the history for reading diversity, reader activity
+        # and catalog coverage
         genre_distribution = defaultdict(int)
-        for record in self.borrowing_records:
-            if record.book_id in self.books_catalog:
-                for genre in self.books_catalog[record.book_id].genre:
-                    genre_distribution[genre] += 1
-        
-        # Most active readers
         student_activity = defaultdict(int)
+        borrowed_books = set()
         for record in self.borrowing_records:
             student_activity[record.student_id] += 1
+            borrowed_books.add(record.book_id)
+            book = self.books_catalog.get(record.book_id)
+            if book is not None:
+                for genre in book.genre:
+                    genre_distribution[genre] += 1
         
-        most_active = sorted(student_activity.items(), key=lambda x: x[1], reverse=True)[:5]
+        most_active = heapq.nlargest(5, student_activity.items(), key=lambda x: x[1])
         
         return {
             'total_students': total_students,
@@ -585,7 +798,7 @@ class SmartReadsRecommendationEngine:
             'average_books_per_student': total_borrows / total_students if total_students > 0 else 0,
             'genre_distribution': dict(genre_distribution),
             'most_active_readers': most_active,
-            'catalog_coverage': len(set(r.book_id for r in self.borrowing_records)) / total_books if total_books > 0 else 0
+            'catalog_coverage': len(borrowed_books) / total_books if total_books > 0 else 0
         }
 
 # Example usage and testing
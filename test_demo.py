@@ -6,6 +6,7 @@ Quick test to verify the recommendation engine works
 
 import sys
 import os
+import inspect
 
 def test_imports():
     """Test if all required modules can be imported"""
@@ -129,6 +130,104 @@ def test_recommendation_engine():
         traceback.print_exc()
         return False
 
+def test_routes_are_async():
+    """Test that every API route handler runs on the event loop"""
+    print("Testing route handlers...")
+    from fastapi.routing import APIRoute
+    from app import app
+    
+    # A plain `def` handler is dispatched to the threadpool; none of ours block
+    sync_routes = [
+        route.path for route in app.routes
+        if isinstance(route, APIRoute) and not inspect.iscoroutinefunction(route.endpoint)
+    ]
+    if sync_routes:
+        print(f"✗ Synchronous route handlers found: {', '.join(sync_routes)}")
+    assert not sync_routes, "Route handlers must be declared with async def"
+    
+    print("✓ All route handlers are async\n")
+    return True
+
+def test_index_honours_refused_encodings():
+    """Test that a coding refused with q=0 is never used for the web interface"""
+    print("Testing Accept-Encoding handling...")
+    from fastapi.testclient import TestClient
+    from app import app, INDEX_HTML_BYTES
+    
+    client = TestClient(app)
+    for accept_encoding in ("gzip;q=0", "gzip; q=0.0, br;q=0", "identity"):
+        response = client.get("/", headers={"Accept-Encoding": accept_encoding})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers, accept_encoding
+        assert response.content == INDEX_HTML_BYTES
+    
+    response = client.get("/", headers={"Accept-Encoding": "br;q=0, gzip;q=0.5"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == INDEX_HTML_BYTES  # decoded by the client
+    
+    print("✓ Refused encodings are not used\n")
+    return True
+
+def test_gpu_gram_matches_sparse():
+    """Test the torch similarity path against the sparse product"""
+    print("Testing GPU similarity path...")
+    import types
+    import numpy as np
+    import scipy.sparse as sp
+    import recommendation_engine
+    from sklearn.preprocessing import normalize
+    
+    class FakeTensor:
+        """Just enough of a torch tensor, backed by a numpy array"""
+        def __init__(self, array):
+            self.array = array
+        def cuda(self):
+            return self
+        def cpu(self):
+            return self
+        def to_dense(self):
+            return self
+        def numpy(self):
+            return self.array
+        @property
+        def T(self):
+            return FakeTensor(self.array.T)
+        def __matmul__(self, other):
+            return FakeTensor(self.array @ other.array)
+    
+    def sparse_csr_tensor(crow_indices, col_indices, values, size):
+        assert values.array.dtype == np.float32
+        return FakeTensor(sp.csr_matrix((values.array, col_indices.array, crow_indices.array), shape=size).toarray())
+    
+    fake_torch = types.SimpleNamespace(
+        cuda=types.SimpleNamespace(is_available=lambda: True),
+        from_numpy=FakeTensor,
+        sparse_csr_tensor=sparse_csr_tensor
+    )
+    
+    rng = np.random.default_rng(0)
+    matrix = sp.random(40, 30, density=0.1, format='csr', random_state=rng)
+    threshold = recommendation_engine.GPU_MIN_CELLS
+    previous_torch = sys.modules.get('torch')
+    sys.modules['torch'] = fake_torch
+    recommendation_engine.GPU_MIN_CELLS = 0
+    try:
+        # Both the user (CSR rows) and item (transposed, CSC) layouts
+        for vectors in (normalize(matrix), normalize(matrix, axis=0).T):
+            expected = (vectors @ vectors.T).toarray()
+            result = recommendation_engine._gram(vectors)
+            assert result.dtype == np.float32
+            assert np.allclose(result, expected, atol=1e-6)
+    finally:
+        recommendation_engine.GPU_MIN_CELLS = threshold
+        if previous_torch is None:
+            del sys.modules['torch']
+        else:
+            sys.modules['torch'] = previous_torch
+    
+    print("✓ GPU similarity path matches the sparse product\n")
+    return True
+
 def main():
     """Main test function"""
     print("="*60)
@@ -142,6 +241,18 @@ def main():
         print("pip3 install -r requirements.txt")
         sys.exit(1)
     
+    # Test route handlers
+    if not test_routes_are_async():
+        sys.exit(1)
+    
+    # Test content negotiation for the web interface
+    if not test_index_honours_refused_encodings():
+        sys.exit(1)
+    
+    # Test the GPU similarity path (with a stand-in for torch)
+    if not test_gpu_gram_matches_sparse():
+        sys.exit(1)
+    
     # Test recommendation engine
     if not test_recommendation_engine():
         print("\n⚠️  Recommendation engine test failed")